@@ -3,12 +3,14 @@
 import json
 from pathlib import Path
 from datetime import datetime
-from collections import defaultdict, deque
+from collections import deque
 from typing import Dict, Tuple, Optional
 
 # Import the original AlphaWall
 from alphawall import AlphaWall as BaseAlphaWall
 from emotion_handler import predict_emotions
+from feedback_journal import FeedbackJournal
+from pattern_store import PatternStatsStore
 
 
 class AdaptiveAlphaWall(BaseAlphaWall):
@@ -16,17 +18,21 @@ class AdaptiveAlphaWall(BaseAlphaWall):
     Enhanced AlphaWall that adapts its emotion detection thresholds based on feedback.
     """
     
-    def __init__(self, data_dir="data", max_recursion_window=10):
+    def __init__(self, data_dir="data", max_recursion_window=10, max_learned_patterns=50000):
         super().__init__(data_dir, max_recursion_window)
         
         # Adaptive threshold storage
         self.threshold_file = self.data_dir / "adaptive_emotion_thresholds.json"
-        self.feedback_file = self.data_dir / "alphawall_feedback.json"
+        self.feedback_journal = FeedbackJournal(self.data_dir / "alphawall_feedback.jsonl")
+        self.feedback_journal.import_legacy(self.data_dir / "alphawall_feedback.json")
         self.calibration_file = self.data_dir / "emotion_calibration.json"
+        self.pattern_store = PatternStatsStore(self.data_dir / "learned_patterns.db",
+                                               max_patterns=max_learned_patterns)
         
         # Load or initialize adaptive thresholds
         self.emotion_thresholds = self._load_thresholds()
         self.feedback_history = self._load_feedback()
+        self.feedback_count = self.feedback_journal.count()
         self.calibration_data = self._load_calibration()
         
         # Track recent classifications for pattern detection
@@ -70,31 +76,36 @@ class AdaptiveAlphaWall(BaseAlphaWall):
         with open(self.threshold_file, 'w') as f:
             json.dump(self.emotion_thresholds, f, indent=2)
     
-    def _load_feedback(self) -> list:
-        """Load feedback history"""
-        if self.feedback_file.exists():
-            with open(self.feedback_file, 'r') as f:
-                return json.load(f)
-        return []
+    def _load_feedback(self) -> deque:
+        """Load the recent feedback window that adaptation looks at"""
+        return deque(self.feedback_journal.tail(50), maxlen=50)
     
-    def _save_feedback(self):
-        """Save feedback history"""
-        # Keep last 500 feedback entries
-        self.feedback_history = self.feedback_history[-500:]
-        with open(self.feedback_file, 'w') as f:
-            json.dump(self.feedback_history, f, indent=2)
+    def _save_feedback(self, feedback_entry: Dict):
+        """Append one feedback entry to the journal"""
+        self.feedback_history.append(feedback_entry)
+        self.feedback_count += 1
+        self.feedback_journal.append(feedback_entry)
     
     def _load_calibration(self) -> Dict:
         """Load calibration data for emotion detection"""
         if self.calibration_file.exists():
             with open(self.calibration_file, 'r') as f:
-                return json.load(f)
+                calibration = json.load(f)
+            
+            # Learned patterns used to live in this file, move them to the pattern store
+            legacy_patterns = calibration['question_patterns'].pop('learned_patterns', None)
+            if legacy_patterns:
+                for pattern, stats in legacy_patterns.items():
+                    self.pattern_store.merge(pattern, stats.get('info_count', 0), stats.get('expr_count', 0))
+                self.pattern_store.flush()
+            if legacy_patterns is not None:
+                self._save_calibration(calibration)
+            return calibration
         
         return {
             'question_patterns': {
                 'strong_questions': ['what is', 'how does', 'can you explain', 'tell me about'],
-                'weak_questions': ['why', 'what if'],  # Can be emotional
-                'learned_patterns': defaultdict(lambda: {'info_count': 0, 'expr_count': 0})
+                'weak_questions': ['why', 'what if']  # Can be emotional
             },
             'false_positive_phrases': [],
             'context_weights': {
@@ -106,6 +117,11 @@ class AdaptiveAlphaWall(BaseAlphaWall):
             }
         }
     
+    def _save_calibration(self, calibration: Optional[Dict] = None):
+        """Save calibration data (learned patterns are persisted by the pattern store)"""
+        with open(self.calibration_file, 'w') as f:
+            json.dump(calibration if calibration is not None else self.calibration_data, f, indent=2)
+    
     def _detect_emotional_state(self, text: str) -> Tuple[str, float]:
         """
         Adaptive emotion detection that learns from feedback.
@@ -194,12 +210,14 @@ class AdaptiveAlphaWall(BaseAlphaWall):
         if any(text_lower.startswith(qw) for qw in question_words):
             score += weights['starts_with_question_word']
         
-        # Check learned patterns
-        for pattern, stats in self.calibration_data['question_patterns']['learned_patterns'].items():
-            if pattern in text_lower:
-                total = stats['info_count'] + stats['expr_count']
+        # Check learned patterns (look up the text's own bigrams, not every learned one)
+        for pattern in set(self._extract_patterns(text_lower)):
+            stats = self.pattern_store.get(pattern)
+            if stats:
+                info_count, expr_count = stats
+                total = info_count + expr_count
                 if total > 5:  # Enough data to be meaningful
-                    info_ratio = stats['info_count'] / total
+                    info_ratio = info_count / total
                     score += info_ratio * 0.3
         
         # Emotional indicators (reduce score)
@@ -263,18 +281,17 @@ class AdaptiveAlphaWall(BaseAlphaWall):
             'correct_emotion': correct_emotion
         }
         
-        self.feedback_history.append(feedback_entry)
-        self._save_feedback()
+        self._save_feedback(feedback_entry)
         
         # Adapt thresholds if we have enough feedback
-        if len(self.feedback_history) % 10 == 0:
+        if self.feedback_count % 10 == 0:
             self._adapt_thresholds()
     
     def _adapt_thresholds(self):
         """
         Adapt thresholds based on recent feedback.
         """
-        recent_feedback = self.feedback_history[-50:]  # Last 50 entries
+        recent_feedback = list(self.feedback_history)  # Last 50 entries
         if len(recent_feedback) < 10:
             return
         
@@ -313,28 +330,27 @@ class AdaptiveAlphaWall(BaseAlphaWall):
         
         print(f"🔧 AlphaWall adapted: accuracy={accuracy:.2f}, new threshold={self.emotion_thresholds['emotion_confidence_threshold']:.2f}")
     
-    def learn_pattern(self, text: str, actual_intent: str):
+    @staticmethod
+    def _extract_patterns(text_lower: str):
         """
-        Learn from a specific pattern for future classification.
+        Yield the word bigrams used as learned pattern keys.
         """
-        text_lower = text.lower()
-        
-        # Extract 2-3 word phrases as patterns
         words = text_lower.split()
         for i in range(len(words) - 1):
-            pattern = ' '.join(words[i:i+2])
+            pattern = f"{words[i]} {words[i + 1]}"
             if len(pattern) > 3:  # Meaningful pattern
-                stats = self.calibration_data['question_patterns']['learned_patterns'][pattern]
-                if actual_intent == 'information_request':
-                    stats['info_count'] += 1
-                else:
-                    stats['expr_count'] += 1
+                yield pattern
+    
+    def learn_pattern(self, text: str, actual_intent: str):
+        """
+        Learn from a specific pattern for future classification.
+        """
+        text_lower = text.lower()
         
-        # Save calibration data periodically
-        if sum(stats['info_count'] + stats['expr_count'] 
-               for stats in self.calibration_data['question_patterns']['learned_patterns'].values()) % 20 == 0:
-            with open(self.calibration_file, 'w') as f:
-                json.dump(self.calibration_data, f, indent=2)
+        # Extract 2-word phrases as patterns (the store persists itself periodically)
+        is_information = actual_intent == 'information_request'
+        for pattern in self._extract_patterns(text_lower):
+            self.pattern_store.record(pattern, is_information)
     
     def add_false_positive(self, phrase: str):
         """
@@ -346,8 +362,7 @@ class AdaptiveAlphaWall(BaseAlphaWall):
             # Keep list manageable
             self.calibration_data['false_positive_phrases'] = self.calibration_data['false_positive_phrases'][-100:]
             
-            with open(self.calibration_file, 'w') as f:
-                json.dump(self.calibration_data, f, indent=2)
+            self._save_calibration()
     
     def get_adaptation_stats(self) -> Dict:
         """
@@ -359,15 +374,20 @@ class AdaptiveAlphaWall(BaseAlphaWall):
             'recursion': self.emotion_thresholds['recursion_score_threshold'],
             'question_override': self.emotion_thresholds['question_override_threshold']
         }
-        stats['feedback_count'] = len(self.feedback_history)
+        stats['feedback_count'] = self.feedback_count
+        stats['learned_patterns'] = len(self.pattern_store)
         stats['recent_accuracy'] = None
         
         if len(self.feedback_history) >= 10:
-            recent = self.feedback_history[-10:]
+            recent = list(self.feedback_history)[-10:]
             correct = sum(1 for f in recent if f['was_correct'])
             stats['recent_accuracy'] = correct / len(recent)
         
         return stats
+    
+    def close(self):
+        """Write out learned patterns that are still pending"""
+        self.pattern_store.close()
 
 
 # Integration helper
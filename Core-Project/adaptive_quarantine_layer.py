@@ -1,9 +1,9 @@
 # adaptive_quarantine_layer.py - Adaptive Quarantine System
 
 import json
-from pathlib import Path
+import time
 from datetime import datetime
-from collections import defaultdict, deque
+from collections import defaultdict, deque, OrderedDict
 from typing import Dict, List, Optional, Tuple
 import re
 
@@ -11,6 +11,160 @@ import re
 from quarantine_layer import UserMemoryQuarantine as BaseQuarantine
 from quarantine_layer import should_quarantine_input
 from alphawall import AlphaWall
+from feedback_journal import FeedbackJournal
+
+
+class SubstringAutomaton:
+    """
+    Aho-Corasick automaton over a word list.
+    Finds every listed word occurring anywhere in a text in one pass,
+    independent of how many words are in the list.
+    """
+
+    def __init__(self, words: List[str]):
+        # Repeated words count once per listing, like the plain list scan did
+        self.weights = defaultdict(int)
+        for word in words:
+            if word:
+                self.weights[word] += 1
+
+        self._goto = [{}]
+        self._fail = [0]
+        self._output = [()]
+
+        # Build the trie
+        for word in self.weights:
+            state = 0
+            for char in word:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append(())
+                state = next_state
+            self._output[state] = (word,)
+
+        # Breadth-first failure links
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state] = self._output[next_state] + self._output[self._fail[next_state]]
+
+    def find_all(self, text: str) -> set:
+        """Return the set of listed words that occur in text"""
+        found = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+        return found
+
+    def score(self, text: str) -> int:
+        """Number of list entries occurring in text"""
+        return sum(self.weights[word] for word in self.find_all(text))
+
+
+class VaguenessMatcher:
+    """
+    Compiled form of adaptive_config['vague_word_patterns'].
+    Rebuilt only when the vocabularies change, so vagueness scoring
+    costs one pass over the input regardless of vocabulary size.
+    """
+
+    def __init__(self, vague_word_patterns: Dict, version: int = 0):
+        # Version of the config this was compiled from
+        self.version = version
+
+        # Academic words match anywhere in the text
+        self.safe_academic = SubstringAutomaton(vague_word_patterns['safe_academic'])
+
+        # Question words match as a text prefix or anywhere between spaces
+        # (multi-word entries like 'how does' included)
+        self.safe_questions = defaultdict(int)
+        for q_word in vague_word_patterns['safe_questions']:
+            self.safe_questions[q_word] += 1
+        self.max_question_length = max((len(q) for q in self.safe_questions), default=0)
+        self.inner_questions = SubstringAutomaton([f" {q_word} " for q_word in self.safe_questions if q_word])
+
+        # Vague words match whole words only
+        self.true_vague = defaultdict(int)
+        for vague_word in vague_word_patterns['true_vague']:
+            self.true_vague[vague_word] += 1
+
+    def is_current(self, version: int) -> bool:
+        """Was this compiled from the config at this version?"""
+        return self.version == version
+
+    def academic_count(self, text_lower: str) -> int:
+        return self.safe_academic.score(text_lower)
+
+    def question_count(self, text_lower: str) -> int:
+        matched = set()
+
+        # Prefix matches (text_lower.startswith(q_word))
+        for length in range(1, min(self.max_question_length, len(text_lower)) + 1):
+            prefix = text_lower[:length]
+            if prefix in self.safe_questions:
+                matched.add(prefix)
+
+        # Inner matches (f" {q_word} " in text_lower)
+        matched.update(q_word[1:-1] for q_word in self.inner_questions.find_all(text_lower))
+
+        return sum(self.safe_questions[q_word] for q_word in matched)
+
+    def vague_count(self, words: List[str]) -> int:
+        return sum(self.true_vague[word] for word in set(words) if word in self.true_vague)
+
+
+class DecisionStore:
+    """
+    Bounded zone_id -> decision map for matching late feedback.
+    Entries expire after ttl seconds or when max_size newer decisions arrive.
+    """
+
+    def __init__(self, max_size=1000, ttl=1800):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._decisions = OrderedDict()  # zone_id -> (stored_at, decision), oldest first
+
+    def _expire(self, now: float):
+        while self._decisions:
+            zone_id, (stored_at, _) = next(iter(self._decisions.items()))
+            if now - stored_at <= self.ttl:
+                break
+            del self._decisions[zone_id]
+
+    def add(self, zone_id: str, decision: Dict):
+        now = time.monotonic()
+        self._expire(now)
+        self._decisions.pop(zone_id, None)
+        self._decisions[zone_id] = (now, decision)
+        while len(self._decisions) > self.max_size:
+            self._decisions.popitem(last=False)
+
+    def get(self, zone_id: str) -> Optional[Dict]:
+        self._expire(time.monotonic())
+        entry = self._decisions.get(zone_id)
+        return entry[1] if entry else None
+
+    def __len__(self) -> int:
+        return len(self._decisions)
+
+    def clear(self):
+        self._decisions.clear()
 
 
 class AdaptiveQuarantine(BaseQuarantine):
@@ -18,19 +172,27 @@ class AdaptiveQuarantine(BaseQuarantine):
     Enhanced quarantine system that learns what actually needs quarantining.
     """
     
-    def __init__(self, data_dir="data"):
+    def __init__(self, data_dir="data", decision_retention=1000, decision_ttl=1800):
         super().__init__(data_dir)
         
         # Adaptive thresholds and patterns
         self.adaptive_config_file = self.quarantine_dir / "adaptive_quarantine_config.json"
-        self.false_positive_log = self.quarantine_dir / "false_positives.json"
-        self.true_positive_log = self.quarantine_dir / "true_positives.json"
+        self.false_positive_log = FeedbackJournal(self.quarantine_dir / "false_positives.jsonl")
+        self.true_positive_log = FeedbackJournal(self.quarantine_dir / "true_positives.jsonl")
+        self.false_positive_log.import_legacy(self.quarantine_dir / "false_positives.json")
+        self.true_positive_log.import_legacy(self.quarantine_dir / "true_positives.json")
         
         # Load adaptive configuration
         self.adaptive_config = self._load_adaptive_config()
+        self._vagueness_matcher = None
+        # Bumped whenever the config is changed or saved, so the compiled matcher is rebuilt
+        self._config_version = 0
         
         # Track recent decisions for context
         self.recent_decisions = deque(maxlen=10)
+        
+        # Decisions awaiting feedback, which may arrive long after recent_decisions moved on
+        self.decision_store = DecisionStore(max_size=decision_retention, ttl=decision_ttl)
         self.session_context = {
             'false_positives': 0,
             'true_positives': 0,
@@ -76,8 +238,17 @@ class AdaptiveQuarantine(BaseQuarantine):
     
     def _save_adaptive_config(self):
         """Save adaptive configuration"""
+        self._config_version += 1
         with open(self.adaptive_config_file, 'w') as f:
             json.dump(self.adaptive_config, f, indent=2)
+
+    def _get_vagueness_matcher(self) -> VaguenessMatcher:
+        """Return the compiled vocabularies, recompiling if the config changed"""
+        patterns = self.adaptive_config['vague_word_patterns']
+        matcher = self._vagueness_matcher
+        if matcher is None or not matcher.is_current(self._config_version):
+            matcher = self._vagueness_matcher = VaguenessMatcher(patterns, self._config_version)
+        return matcher
     
     def _calculate_vagueness_score(self, text: str, zone_output: Dict) -> float:
         """
@@ -94,25 +265,17 @@ class AdaptiveQuarantine(BaseQuarantine):
         if len(words) < self.adaptive_config['min_words_threshold']:
             vagueness += 0.3
         
-        # Check if it's an academic/safe topic
-        safe_academic = self.adaptive_config['vague_word_patterns']['safe_academic']
-        safe_questions = self.adaptive_config['vague_word_patterns']['safe_questions']
+        matcher = self._get_vagueness_matcher()
         
         # Academic topics are NOT vague
-        for safe_word in safe_academic:
-            if safe_word in text_lower:
-                vagueness -= 0.4
+        vagueness -= 0.4 * matcher.academic_count(text_lower)
                 
         # Question words indicate information seeking, not vagueness
-        for q_word in safe_questions:
-            if text_lower.startswith(q_word) or f" {q_word} " in text_lower:
-                vagueness -= 0.3
+        vagueness -= 0.3 * matcher.question_count(text_lower)
         
         # Check for true vague patterns
-        true_vague = self.adaptive_config['vague_word_patterns']['true_vague']
-        for vague_word in true_vague:
-            if vague_word in words and len(words) < 4:
-                vagueness += 0.3
+        if len(words) < 4:
+            vagueness += 0.3 * matcher.vague_count(words)
         
         # Consider emotional state from zone
         emotional_state = zone_output['tags'].get('emotional_state', 'neutral')
@@ -123,8 +286,7 @@ class AdaptiveQuarantine(BaseQuarantine):
         if self.session_context['last_topics']:
             # If we've been discussing academic topics, reduce vagueness
             recent_topics = ' '.join(self.session_context['last_topics'])
-            academic_count = sum(1 for word in safe_academic if word in recent_topics)
-            if academic_count > 0:
+            if matcher.academic_count(recent_topics) > 0:
                 vagueness -= 0.2
         
         # Question mark indicates seeking information, not being vague
@@ -261,6 +423,7 @@ class AdaptiveQuarantine(BaseQuarantine):
         }
         
         self.recent_decisions.append(decision)
+        self.decision_store.add(decision['zone_id'], decision)
         
         # Extract topic for context
         words = text.lower().split()
@@ -272,12 +435,7 @@ class AdaptiveQuarantine(BaseQuarantine):
     def record_feedback(self, zone_id: str, was_false_positive: bool, correct_classification: Optional[str] = None):
         """Record feedback about quarantine decisions"""
         # Find the decision
-        decision = None
-        for d in self.recent_decisions:
-            if d.get('zone_id') == zone_id:
-                decision = d
-                break
-                
+        decision = self.decision_store.get(zone_id)
         if not decision:
             return
         
@@ -303,19 +461,9 @@ class AdaptiveQuarantine(BaseQuarantine):
             self.session_context['true_positives'] += 1
             self._save_to_log(self.true_positive_log, feedback_entry)
     
-    def _save_to_log(self, log_file: Path, entry: Dict):
-        """Save entry to log file"""
-        if log_file.exists():
-            with open(log_file, 'r') as f:
-                log = json.load(f)
-        else:
-            log = []
-            
+    def _save_to_log(self, log: FeedbackJournal, entry: Dict):
+        """Append entry to feedback journal"""
         log.append(entry)
-        log = log[-500:]  # Keep last 500
-        
-        with open(log_file, 'w') as f:
-            json.dump(log, f, indent=2)
     
     def _learn_from_false_positive(self, decision: Dict):
         """Adjust thresholds based on false positive"""
@@ -335,6 +483,7 @@ class AdaptiveQuarantine(BaseQuarantine):
                 word = pattern_words[0]
                 if word not in self.adaptive_config['vague_word_patterns']['safe_academic']:
                     self.adaptive_config['vague_word_patterns']['safe_academic'].append(word)
+                    self._config_version += 1
         
         # Update stats
         total = self.session_context['false_positives'] + self.session_context['true_positives']
@@ -376,6 +525,7 @@ class AdaptiveQuarantine(BaseQuarantine):
             'last_topics': deque(maxlen=5)
         }
         self.recent_decisions.clear()
+        # decision_store is kept so late feedback on the previous conversation still counts
 
 
 # Enhanced quarantine check for bridge integration
@@ -389,8 +539,7 @@ def adaptive_quarantine_check(text: str, zone_output: Dict, quarantine: Adaptive
         'should_quarantine': should_quarantine,
         'reason': reason,
         'confidence': 0.9 if should_quarantine else 0.1,
-        'is_academic': any(word in text.lower() for word in 
-                          quarantine.adaptive_config['vague_word_patterns']['safe_academic']),
+        'is_academic': quarantine._get_vagueness_matcher().academic_count(text.lower()) > 0,
         'vagueness_score': quarantine._calculate_vagueness_score(text, zone_output)
     }
     
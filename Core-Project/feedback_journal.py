@@ -0,0 +1,192 @@
+# feedback_journal.py - Append-only JSONL journals for adaptive feedback
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: rotation is only serialized within this process
+    fcntl = None
+
+
+class FeedbackJournal:
+    """
+    Append-only JSON-lines log with size-based rotation.
+    Each feedback event costs one small append instead of rewriting the whole log.
+    Retention is bounded to (backup_count + 1) segments of max_bytes each;
+    on_drop, if given, receives the entries of each segment as it is dropped.
+    """
+
+    def __init__(self, path, max_bytes=256 * 1024, backup_count=3,
+                 on_drop: Optional[Callable[[List[Dict]], None]] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.on_drop = on_drop
+        self._lock_path = self.path.with_name(self.path.name + '.lock')
+        self._rotate_lock = threading.Lock()
+
+    def _segment(self, index: int) -> Path:
+        """Segment 0 is the live file, higher numbers are older"""
+        if index == 0:
+            return self.path
+        return self.path.with_name(f"{self.path.name}.{index}")
+
+    def _segments_newest_first(self) -> List[Path]:
+        segments = []
+        for index in range(self.backup_count + 1):
+            segment = self._segment(index)
+            if segment.exists():
+                segments.append(segment)
+        return segments
+
+    def exists(self) -> bool:
+        return bool(self._segments_newest_first())
+
+    def append(self, entry: Dict):
+        """Append one entry, rotating when the live segment is full"""
+        self.extend([entry])
+
+    def extend(self, entries: List[Dict]):
+        """Append several entries with as few writes as the live segment allows"""
+        lines = [(json.dumps(entry, separators=(',', ':')) + '\n').encode('utf-8') for entry in entries]
+        start = 0
+        while start < len(lines):
+            # Take only as many lines as fit in the live segment, so a burst can't overshoot it
+            try:
+                room = self.max_bytes - self.path.stat().st_size
+            except FileNotFoundError:
+                room = self.max_bytes
+            end = start + 1
+            room -= len(lines[start])
+            while end < len(lines) and room > 0:
+                room -= len(lines[end])
+                end += 1
+
+            # Single write in append mode so concurrent writers never interleave lines
+            with open(self.path, 'ab') as f:
+                f.write(b''.join(lines[start:end]))
+                size = f.tell()
+            start = end
+
+            if size >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self):
+        """Shift segments up by one, dropping the oldest (under a lock file, so only one process rotates)"""
+        with self._rotate_lock, open(self._lock_path, 'a') as lock_file:
+            if fcntl:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                # Another process may have rotated while we waited
+                if not self.path.exists() or self.path.stat().st_size < self.max_bytes:
+                    return
+
+                oldest = self._segment(self.backup_count)
+                if oldest.exists():
+                    if self.on_drop:
+                        self.on_drop(list(self._read_segment(oldest)))
+                    oldest.unlink()
+                for index in range(self.backup_count - 1, -1, -1):
+                    segment = self._segment(index)
+                    if segment.exists():
+                        os.replace(segment, self._segment(index + 1))
+            finally:
+                if fcntl:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def tail(self, n: int) -> List[Dict]:
+        """
+        Return the last n entries, oldest first.
+        Reads backwards from the end of the newest segments, so cost
+        depends on n rather than on the size of the journal.
+        """
+        if n <= 0:
+            return []
+
+        lines = []
+        for segment in self._segments_newest_first():
+            lines.extend(self._tail_lines(segment, n - len(lines)))
+            if len(lines) >= n:
+                break
+
+        entries = []
+        for raw in reversed(lines):
+            entry = self._parse(raw)
+            if entry is not None:
+                entries.append(entry)
+        return entries
+
+    @staticmethod
+    def _tail_lines(segment: Path, n: int, block_size=8192) -> List[bytes]:
+        """Last n lines of one segment, newest first"""
+        with open(segment, 'rb') as f:
+            f.seek(0, os.SEEK_END)
+            position = f.tell()
+            buffer = b''
+            lines = []
+
+            while position > 0 and len(lines) < n:
+                read_size = min(block_size, position)
+                position -= read_size
+                f.seek(position)
+                buffer = f.read(read_size) + buffer
+
+                # Everything after the first newline is complete lines
+                parts = buffer.split(b'\n')
+                buffer = parts[0]
+                for part in reversed(parts[1:]):
+                    if part:
+                        lines.append(part)
+
+            if position == 0 and buffer and len(lines) < n:
+                lines.append(buffer)
+
+        return lines[:n]
+
+    @staticmethod
+    def _parse(raw: bytes):
+        try:
+            return json.loads(raw)
+        except ValueError:
+            # Torn write from a crashed process, skip it
+            return None
+
+    def _read_segment(self, segment: Path) -> Iterator[Dict]:
+        with open(segment, 'rb') as f:
+            for raw in f:
+                raw = raw.strip()
+                if raw:
+                    entry = self._parse(raw)
+                    if entry is not None:
+                        yield entry
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Iterate all retained entries, oldest first"""
+        for segment in reversed(self._segments_newest_first()):
+            yield from self._read_segment(segment)
+
+    def count(self) -> int:
+        """Number of retained entries"""
+        total = 0
+        for segment in self._segments_newest_first():
+            with open(segment, 'rb') as f:
+                for block in iter(lambda: f.read(65536), b''):
+                    total += block.count(b'\n')
+        return total
+
+    def import_legacy(self, legacy_file: Path):
+        """One-time import of an old whole-file JSON log"""
+        legacy_file = Path(legacy_file)
+        if self.exists() or not legacy_file.exists():
+            return
+        try:
+            with open(legacy_file, 'r') as f:
+                entries = json.load(f)
+        except (ValueError, OSError):
+            return
+        self.extend(entries)
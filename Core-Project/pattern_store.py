@@ -0,0 +1,232 @@
+# pattern_store.py - Bounded learned-pattern statistics with SQLite persistence
+
+import atexit
+import sqlite3
+from array import array
+from pathlib import Path
+from collections import defaultdict
+from typing import Optional, Tuple
+
+
+class FrequencySketch:
+    """
+    Count-min sketch of how often patterns were seen recently, in fixed memory.
+    Every count is halved after reset_after additions, so old popularity fades
+    and patterns that recur now can win against ones that were common long ago.
+    """
+
+    MAX_COUNT = 0xFFFF
+
+    def __init__(self, width: int, depth: int = 4, reset_after: Optional[int] = None):
+        self.width = width
+        self.rows = [array('H', bytes(2 * width)) for _ in range(depth)]
+        self.reset_after = reset_after or 10 * width
+        self.additions = 0
+
+    def _cells(self, pattern: str):
+        for seed, row in enumerate(self.rows):
+            yield row, hash((seed, pattern)) % self.width
+
+    def add(self, pattern: str):
+        for row, index in self._cells(pattern):
+            if row[index] < self.MAX_COUNT:
+                row[index] += 1
+        self.additions += 1
+        if self.additions >= self.reset_after:
+            self._halve()
+
+    def estimate(self, pattern: str) -> int:
+        return min(row[index] for row, index in self._cells(pattern))
+
+    def _halve(self):
+        for row in self.rows:
+            for index in range(self.width):
+                row[index] >>= 1
+        self.additions //= 2
+
+
+class PatternStatsStore:
+    """
+    info/expressive counts per learned pattern, capped at max_patterns.
+    When full, the least frequently seen pattern is evicted (oldest first among ties),
+    so memory stays flat no matter how long learning runs. A new pattern only gets
+    in once it has been seen recently more often than that victim (TinyLFU admission),
+    so a stream of one-off patterns can't keep pushing out a recurring newcomer.
+    Changes are written to SQLite in batches of flush_every observations,
+    and whatever is still pending when the process exits.
+    """
+
+    def __init__(self, db_path, max_patterns=50000, flush_every=200):
+        if max_patterns < 1:
+            raise ValueError("max_patterns must be at least 1")
+        self.db_path = Path(db_path)
+        self.max_patterns = max_patterns
+        self.flush_every = flush_every
+
+        # pattern -> [info_count, expr_count]
+        self._stats = {}
+        # total count -> patterns with that total, in insertion order (O(1) LFU)
+        self._buckets = defaultdict(dict)
+        self._min_total = 0
+
+        # Running total of all counts, kept up to date instead of re-summed
+        self.total_observations = 0
+
+        # Recent frequencies, including patterns that were not admitted
+        self.sketch = FrequencySketch(width=max(64, max_patterns))
+        self.rejected = 0
+
+        # Pending persistence work
+        self._dirty = set()
+        self._evicted = set()
+        self._pending = 0
+
+        # atexit may close the store from another thread than the one that opened it
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS patterns ("
+            "pattern TEXT PRIMARY KEY, info_count INTEGER NOT NULL, expr_count INTEGER NOT NULL)"
+        )
+        self._load()
+        atexit.register(self.close)
+
+    def _load(self):
+        """Load the most frequent patterns that fit under the cap"""
+        rows = self._conn.execute(
+            "SELECT pattern, info_count, expr_count FROM patterns "
+            "ORDER BY info_count + expr_count ASC"
+        ).fetchall()
+
+        # Rows beyond the cap (e.g. after lowering max_patterns) are dropped from disk too
+        overflow = len(rows) - self.max_patterns
+        if overflow > 0:
+            self._evicted.update(pattern for pattern, _, _ in rows[:overflow])
+            rows = rows[overflow:]
+
+        for pattern, info_count, expr_count in rows:
+            self._insert(pattern, info_count, expr_count)
+
+    def _insert(self, pattern: str, info_count: int, expr_count: int):
+        total = info_count + expr_count
+        self._stats[pattern] = [info_count, expr_count]
+        self._buckets[total][pattern] = None
+        if len(self._stats) == 1 or total < self._min_total:
+            self._min_total = total
+        self.total_observations += total
+
+    def _victim(self) -> str:
+        return next(iter(self._buckets[self._min_total]))
+
+    def _evict_one(self):
+        bucket = self._buckets[self._min_total]
+        victim = next(iter(bucket))
+        del bucket[victim]
+        if not bucket:
+            del self._buckets[self._min_total]
+
+        info_count, expr_count = self._stats.pop(victim)
+        self.total_observations -= info_count + expr_count
+        self._dirty.discard(victim)
+        self._evicted.add(victim)
+
+        # Next smallest bucket (only walked when the min bucket empties)
+        if self._stats and self._min_total not in self._buckets:
+            self._min_total = min(self._buckets)
+
+    def record(self, pattern: str, is_information: bool):
+        """Count one observation of pattern"""
+        self.sketch.add(pattern)
+        stats = self._stats.get(pattern)
+
+        if stats is None:
+            if len(self._stats) >= self.max_patterns:
+                # Admit only if it recurs more than what it would replace
+                if self.sketch.estimate(pattern) <= self.sketch.estimate(self._victim()):
+                    self.rejected += 1
+                    return
+                self._evict_one()
+            self._evicted.discard(pattern)
+            self._insert(pattern, int(is_information), int(not is_information))
+            self._min_total = 1
+        else:
+            old_total = stats[0] + stats[1]
+            stats[0 if is_information else 1] += 1
+            self.total_observations += 1
+
+            # Move up one frequency bucket
+            bucket = self._buckets[old_total]
+            del bucket[pattern]
+            if not bucket:
+                del self._buckets[old_total]
+                if self._min_total == old_total:
+                    self._min_total = old_total + 1
+            self._buckets[old_total + 1][pattern] = None
+
+        self._dirty.add(pattern)
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def merge(self, pattern: str, info_count: int, expr_count: int):
+        """Add existing counts for a pattern (used when importing old calibration data)"""
+        if info_count + expr_count <= 0:
+            return
+
+        stats = self._stats.get(pattern)
+        if stats is not None:
+            info_count += stats[0]
+            expr_count += stats[1]
+            total = stats[0] + stats[1]
+            del self._buckets[total][pattern]
+            if not self._buckets[total]:
+                del self._buckets[total]
+            del self._stats[pattern]
+            self.total_observations -= total
+        elif len(self._stats) >= self.max_patterns:
+            self._evict_one()
+
+        self._evicted.discard(pattern)
+        self._insert(pattern, info_count, expr_count)
+        self._min_total = min(self._buckets)
+        self._dirty.add(pattern)
+
+    def get(self, pattern: str) -> Optional[Tuple[int, int]]:
+        """(info_count, expr_count) for pattern, or None if unknown"""
+        stats = self._stats.get(pattern)
+        return (stats[0], stats[1]) if stats else None
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+    def __contains__(self, pattern: str) -> bool:
+        return pattern in self._stats
+
+    def flush(self):
+        """Write changed and evicted patterns to disk in one transaction"""
+        if not self._dirty and not self._evicted:
+            self._pending = 0
+            return
+
+        with self._conn:
+            if self._evicted:
+                self._conn.executemany(
+                    "DELETE FROM patterns WHERE pattern = ?",
+                    [(pattern,) for pattern in self._evicted]
+                )
+            if self._dirty:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO patterns (pattern, info_count, expr_count) VALUES (?, ?, ?)",
+                    [(pattern, *self._stats[pattern]) for pattern in self._dirty]
+                )
+
+        self._dirty.clear()
+        self._evicted.clear()
+        self._pending = 0
+
+    def close(self):
+        if self._conn is None:
+            return
+        self.flush()
+        self._conn.close()
+        self._conn = None
+        atexit.unregister(self.close)
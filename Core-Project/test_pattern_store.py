@@ -0,0 +1,51 @@
+# test_pattern_store.py - Bounded learned-pattern store
+
+import pytest
+
+from pattern_store import PatternStatsStore
+
+
+def test_recurring_pattern_gets_in_after_the_store_is_full(tmp_path):
+    store = PatternStatsStore(tmp_path / "patterns.db", max_patterns=100)
+    for i in range(100):
+        store.record(f"old {i}", True)
+        store.record(f"old {i}", True)
+    assert len(store) == 100
+
+    # Each message brings the recurring pattern plus a bigram never seen again
+    for i in range(50):
+        store.record("what is", True)
+        store.record(f"one-off {i}", False)
+
+    info_count, expr_count = store.get("what is")
+    assert info_count + expr_count > 5
+    assert len(store) == 100
+    assert sum(store.get(f"one-off {i}") is not None for i in range(50)) <= 1
+    store.close()
+
+
+def test_counts_survive_a_restart(tmp_path):
+    store = PatternStatsStore(tmp_path / "patterns.db", flush_every=1000)
+    for _ in range(3):
+        store.record("how do", True)
+    store.record("how do", False)
+    store.close()
+
+    store = PatternStatsStore(tmp_path / "patterns.db")
+    assert store.get("how do") == (3, 1)
+    assert store.total_observations == 4
+    store.close()
+
+
+def test_eviction_keeps_memory_bounded(tmp_path):
+    store = PatternStatsStore(tmp_path / "patterns.db", max_patterns=10)
+    for i in range(1000):
+        store.record(f"pattern {i % 40}", i % 2 == 0)
+    assert len(store) == 10
+    assert store.total_observations == sum(sum(store.get(p)) for p in store._stats)
+    store.close()
+
+
+def test_rejects_an_empty_capacity(tmp_path):
+    with pytest.raises(ValueError):
+        PatternStatsStore(tmp_path / "patterns.db", max_patterns=0)
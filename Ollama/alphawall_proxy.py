@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+alphawall_proxy.py - Ollama-compatible HTTP proxy that scrambles every prompt
+Usage:
+    python alphawall_proxy.py --port 11435
+    OLLAMA_HOST=127.0.0.1:11435 ollama run llama2      # any Ollama client, now protected
+
+Serves /api/generate, /api/chat and /api/tags like Ollama does. Prompts and
+user messages go through WordScramblerAlphaWall before they are forwarded
+to the upstream Ollama over pooled keep-alive connections, and replies are
+streamed straight back. Chat history is scrambled once: later requests of
+the same conversation resend earlier user turns exactly as first scrambled,
+so they are not stored again and the upstream sees a stable prompt prefix.
+Generations queue for upstream slots by priority
+(request_scheduler.py) and get a 503 when the queue is full or too slow.
+/ready reports whether the proxy can take traffic.
+
+Needs aiohttp (pip install aiohttp).
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sys
+from collections import OrderedDict
+from contextlib import nullcontext
+from typing import Dict, Optional
+
+try:
+    import aiohttp
+    from aiohttp import web
+except ImportError:  # Only the proxy needs it; the rest of the scrambler runs without
+    aiohttp = None
+    web = None
+
+from ollama_alphawall_plugin import WordScramblerAlphaWall
+from ollama_client import _host_from_env, _parse_keep_alive
+from request_scheduler import PRIORITY_NORMAL, AsyncRequestScheduler, SchedulerBusy, priority_for
+
+
+# Hop-by-hop and length headers are for our own connection, not the upstream one
+_SKIP_HEADERS = {'connection', 'keep-alive', 'transfer-encoding', 'content-length',
+                 'content-encoding', 'host', 'upgrade'}
+
+
+class AlphaWallProxy:
+    """Ollama API in front of an upstream Ollama, scrambling what users send"""
+
+    def __init__(self, upstream: Optional[str] = None, data_dir: str = "scrambler_data",
+                 lexicon_path: Optional[str] = None, max_active: int = 64, max_waiting: int = 256,
+                 queue_timeout: float = 10.0, pool_size: int = 100, read_timeout: float = 300,
+                 alphawall_dir: Optional[str] = None, keep_alive=None, history_cache_size: int = 4096):
+        self.upstream = (upstream or _host_from_env()).rstrip('/')
+        self.wall = WordScramblerAlphaWall(data_dir=data_dir, lexicon_path=lexicon_path)
+        self.max_active = max_active
+        self.max_waiting = max_waiting
+        self.queue_timeout = queue_timeout
+        self.pool_size = pool_size
+        self.read_timeout = read_timeout
+        # Residency for requests that don't set their own keep_alive
+        self.keep_alive = keep_alive
+
+        # Optional semantic tagging from the Core-Project AlphaWall (heavier: embeddings, emotions)
+        self.tagger = None
+        if alphawall_dir:
+            sys.path.insert(0, alphawall_dir)
+            from alphawall import AlphaWall
+            self.tagger = AlphaWall(data_dir=os.path.join(data_dir, "alphawall"))
+
+        # Chat turns already scrambled: hash of the conversation up to and including the turn -> result
+        self._history: OrderedDict = OrderedDict()
+        self.history_cache_size = history_cache_size
+
+        self.scheduler: Optional[AsyncRequestScheduler] = None
+        self.session: Optional['aiohttp.ClientSession'] = None
+        self.stats = {'requests': 0, 'scrambled': 0, 'history_reused': 0, 'upstream_errors': 0}
+
+    # ---------- lifecycle ----------
+
+    async def _startup(self, app):
+        # Created here so it belongs to the server's event loop
+        self.scheduler = AsyncRequestScheduler(self.max_active, self.max_waiting, self.queue_timeout)
+        connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60)
+        timeout = aiohttp.ClientTimeout(sock_connect=5, sock_read=self.read_timeout)
+        self.session = aiohttp.ClientSession(connector=connector, timeout=timeout)
+
+    async def _cleanup(self, app):
+        await self.session.close()
+
+    def build_app(self) -> 'web.Application':
+        app = web.Application(client_max_size=16 * 1024 * 1024)
+        app.router.add_post('/api/generate', self.handle_generate)
+        app.router.add_post('/api/chat', self.handle_chat)
+        app.router.add_get('/api/tags', self.handle_tags)
+        app.router.add_get('/ready', self.handle_ready)
+        app.on_startup.append(self._startup)
+        app.on_cleanup.append(self._cleanup)
+        return app
+
+    # ---------- scrambling ----------
+
+    async def _scramble(self, text: str) -> Dict:
+        """Scramble one user text; tags come from AlphaWall when it is enabled"""
+        # Off the event loop: a large prompt takes long enough to stall every other connection
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, self.wall.process_input, text)
+        self.stats['scrambled'] += 1
+        if self.tagger is not None:
+            zone = await loop.run_in_executor(None, self.tagger.process_input, text)
+            result['tags'] = zone['tags']
+        return result
+
+    async def _scramble_turn(self, key: str, text: str) -> Dict:
+        """Scramble a chat turn once; the same turn of the same conversation reuses the result"""
+        result = self._history.get(key)
+        if result is not None:
+            self._history.move_to_end(key)
+            self.stats['history_reused'] += 1
+            return result
+        result = await self._scramble(text)
+        self._history[key] = result
+        while len(self._history) > self.history_cache_size:
+            self._history.popitem(last=False)
+        return result
+
+    @staticmethod
+    def _annotate(headers: Dict, result: Dict):
+        headers['X-AlphaWall-Memory-Id'] = result['memory_id']
+        if 'tags' in result:
+            headers['X-AlphaWall-Tags'] = json.dumps(result['tags'])
+
+    # ---------- handlers ----------
+
+    async def _read_json(self, request) -> Dict:
+        body = await self._parse_json(request)
+        if self.keep_alive is not None:
+            body.setdefault('keep_alive', self.keep_alive)
+        return body
+
+    async def _parse_json(self, request) -> Dict:
+        try:
+            body = await request.json()
+        except ValueError:
+            raise web.HTTPBadRequest(text=json.dumps({'error': 'invalid JSON body'}),
+                                     content_type='application/json')
+        if not isinstance(body, dict):
+            raise web.HTTPBadRequest(text=json.dumps({'error': 'expected a JSON object'}),
+                                     content_type='application/json')
+        return body
+
+    async def handle_generate(self, request):
+        body = await self._read_json(request)
+        headers = {}
+        priority = PRIORITY_NORMAL
+        if isinstance(body.get('prompt'), str) and body['prompt']:
+            result = await self._scramble(body['prompt'])
+            body['prompt'] = result['scrambled_input']
+            self._annotate(headers, result)
+            priority = priority_for(result['features'])
+        return await self._forward(request, '/api/generate', body, headers, priority)
+
+    async def handle_chat(self, request):
+        body = await self._read_json(request)
+        headers = {}
+        priority = PRIORITY_NORMAL
+        # Clients resend the whole history each turn; a turn is identified by everything up to it
+        conversation = hashlib.sha256(str(body.get('model')).encode())
+        for message in body.get('messages') or []:
+            if not isinstance(message, dict):
+                continue
+            conversation.update(json.dumps([message.get('role'), message.get('content')]).encode())
+            # System prompts come from the operator; only what users wrote is scrambled
+            if message.get('role') == 'user' and isinstance(message.get('content'), str):
+                result = await self._scramble_turn(conversation.hexdigest(), message['content'])
+                message['content'] = result['scrambled_input']
+                self._annotate(headers, result)
+                priority = priority_for(result['features'])  # The latest user message decides
+        return await self._forward(request, '/api/chat', body, headers, priority)
+
+    async def handle_tags(self, request):
+        return await self._forward(request, '/api/tags', None, {}, priority=None)
+
+    async def handle_ready(self, request):
+        """200 when the upstream answers and the queue has room, 503 otherwise"""
+        status = {
+            'upstream': self.upstream,
+            'scheduler': self.scheduler.get_stats(),
+            **self.stats
+        }
+        ready = not self.scheduler.saturated(self.upstream)
+        try:
+            async with self.session.get(f"{self.upstream}/api/tags",
+                                        timeout=aiohttp.ClientTimeout(total=2)) as upstream:
+                status['upstream_ok'] = upstream.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            status['upstream_ok'] = False
+        ready = ready and status['upstream_ok']
+        status['ready'] = ready
+        return web.json_response(status, status=200 if ready else 503)
+
+    async def _forward(self, request, path: str, body: Optional[Dict], headers: Dict,
+                       priority: Optional[int] = PRIORITY_NORMAL):
+        """
+        Send to the upstream Ollama and relay its answer, streaming when it streams.
+        Generations wait for a scheduler slot; priority=None (cheap calls) skips the queue.
+        """
+        self.stats['requests'] += 1
+        response = None
+        slot = self.scheduler.slot(self.upstream, priority) if priority is not None else nullcontext()
+        try:
+            async with slot:
+                method = 'GET' if body is None else 'POST'
+                async with self.session.request(method, f"{self.upstream}{path}", json=body) as upstream:
+                    for name, value in upstream.headers.items():
+                        if name.lower() not in _SKIP_HEADERS:
+                            headers.setdefault(name, value)
+
+                    response = web.StreamResponse(status=upstream.status, headers=headers)
+                    await response.prepare(request)
+                    # Relay chunks as they arrive so tokens reach the client without buffering
+                    async for chunk in upstream.content.iter_any():
+                        await response.write(chunk)
+                    await response.write_eof()
+                    return response
+        except SchedulerBusy as e:
+            return web.json_response({'error': f"proxy busy, retry later ({e})"}, status=503,
+                                     headers={'Retry-After': str(max(1, round(e.retry_after)))})
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.stats['upstream_errors'] += 1
+            if response is not None and response.prepared:
+                return response  # Already streaming: the client sees the reply cut short
+            return web.json_response({'error': f"upstream Ollama unavailable: {e}"}, status=502)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ollama-compatible proxy that scrambles prompts with AlphaWall")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11435)
+    parser.add_argument('--upstream', default=None, help="upstream Ollama (default: OLLAMA_HOST or localhost:11434)")
+    parser.add_argument('--max-active', type=int, default=64, help="requests sent upstream at once")
+    parser.add_argument('--max-waiting', type=int, default=256, help="requests queued before answering 503")
+    parser.add_argument('--queue-timeout', type=float, default=10.0, help="seconds a request may wait for a slot")
+    parser.add_argument('--pool-size', type=int, default=100, help="upstream keep-alive connections")
+    parser.add_argument('--lexicon', default=os.environ.get('ALPHAWALL_LEXICON'),
+                        help="compiled lexicon from compact_lexicon.py")
+    parser.add_argument('--alphawall-dir', default=None,
+                        help="Core-Project directory; adds AlphaWall tags as X-AlphaWall-Tags")
+    parser.add_argument('--keep-alive', default=None,
+                        help="how long upstream keeps models loaded when clients don't say ('10m', -1 forever)")
+    parser.add_argument('--data-dir', default="scrambler_data")
+    args = parser.parse_args()
+
+    if aiohttp is None:
+        print("❌ The proxy needs aiohttp: pip install aiohttp")
+        sys.exit(1)
+
+    proxy = AlphaWallProxy(upstream=args.upstream, data_dir=args.data_dir, lexicon_path=args.lexicon,
+                           max_active=args.max_active, max_waiting=args.max_waiting,
+                           queue_timeout=args.queue_timeout, pool_size=args.pool_size,
+                           alphawall_dir=args.alphawall_dir,
+                           keep_alive=_parse_keep_alive(args.keep_alive))
+    print(f"🛡️ AlphaWall proxy on http://{args.host}:{args.port} → {proxy.upstream}")
+    web.run_app(proxy.build_app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
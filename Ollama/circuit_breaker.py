@@ -0,0 +1,78 @@
+"""
+circuit_breaker.py - Fail fast while an Ollama host is unhealthy
+
+After failure_threshold consecutive failures the breaker opens and calls
+are refused at once instead of each waiting out a timeout. After
+reset_timeout seconds one probe call is let through (half-open). If it
+succeeds the breaker closes; if it fails the breaker opens again.
+"""
+
+import threading
+import time
+from typing import Dict
+
+
+class CircuitBreaker:
+    """Thread-safe closed / open / half-open breaker for one upstream"""
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 15.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+        self.stats = {'opened': 0, 'rejected': 0, 'failures': 0, 'successes': 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            return self._state
+
+    def _maybe_half_open(self, now: float):
+        if self._state == self.OPEN and now - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """May a call go to this upstream now?"""
+        with self._lock:
+            self._maybe_half_open(time.monotonic())
+            if self._state == self.CLOSED:
+                return True
+            if self._state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.stats['rejected'] += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.stats['successes'] += 1
+            self._failures = 0
+            self._state = self.CLOSED
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.stats['failures'] += 1
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    self.stats['opened'] += 1
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def snapshot(self) -> Dict:
+        state = self.state
+        with self._lock:
+            return {'state': state, 'consecutive_failures': self._failures, **self.stats}
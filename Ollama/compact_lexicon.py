@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+compact_lexicon.py - Memory-mapped synonym lexicon for the AlphaWall scrambler
+Build one from a plain-text thesaurus:
+    python compact_lexicon.py thesaurus.txt lexicon.awlex
+
+Thesaurus lines look like either of:
+    headword: synonym, synonym, ...
+    headword,synonym,synonym,...        (Moby thesaurus style)
+Lines starting with '#' are ignored.
+
+File layout (all integers little-endian uint32):
+    header      magic, word count, string count, synonym reference count
+    str_offsets (strings + 1) byte offsets into the string blob
+    syn_starts  (words + 1) ranges into syn_refs, one per headword
+    syn_refs    string-table index of each synonym
+    blob        UTF-8 strings; headwords first, sorted by their bytes
+Lookups binary-search the headwords straight out of the mapped file, so
+opening takes milliseconds and the pages are shared by every process.
+"""
+
+import argparse
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+
+MAGIC = b'AWLEX001'
+HEADER = struct.Struct('<8sIII')
+UINT32 = struct.Struct('<I')
+
+
+class CompactLexicon(Mapping):
+    """Read-only word -> synonyms mapping backed by a memory-mapped lexicon file"""
+
+    _open_lexicons: Dict[str, 'CompactLexicon'] = {}
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path, 'rb') as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.word_count, self.string_count, self.synonym_count = HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{self.path} is not a compact lexicon")
+
+        self._str_offsets = HEADER.size
+        self._syn_starts = self._str_offsets + 4 * (self.string_count + 1)
+        self._syn_refs = self._syn_starts + 4 * (self.word_count + 1)
+        self._blob = self._syn_refs + 4 * self.synonym_count
+
+        # Small cache for words a conversation keeps repeating
+        self._cache: Dict[str, Optional[Tuple[str, ...]]] = {}
+        self._cache_limit = 4096
+
+    @classmethod
+    def open(cls, path) -> 'CompactLexicon':
+        """Open a lexicon once per process and share it between scramblers"""
+        key = os.path.realpath(path)
+        lexicon = cls._open_lexicons.get(key)
+        if lexicon is None:
+            lexicon = cls._open_lexicons[key] = cls(path)
+        return lexicon
+
+    def _uint(self, base: int, index: int) -> int:
+        return UINT32.unpack_from(self._mm, base + 4 * index)[0]
+
+    def _string_bytes(self, index: int) -> bytes:
+        start = self._uint(self._str_offsets, index)
+        end = self._uint(self._str_offsets, index + 1)
+        return self._mm[self._blob + start:self._blob + end]
+
+    def _find(self, word: str) -> int:
+        """Index of word among the headwords, or -1"""
+        target = word.encode('utf-8')
+        low, high = 0, self.word_count
+        while low < high:
+            mid = (low + high) // 2
+            if self._string_bytes(mid) < target:
+                low = mid + 1
+            else:
+                high = mid
+        if low < self.word_count and self._string_bytes(low) == target:
+            return low
+        return -1
+
+    def _synonyms(self, index: int) -> Tuple[str, ...]:
+        start = self._uint(self._syn_starts, index)
+        end = self._uint(self._syn_starts, index + 1)
+        return tuple(
+            self._string_bytes(self._uint(self._syn_refs, ref)).decode('utf-8')
+            for ref in range(start, end)
+        )
+
+    def get(self, word: str, default=None):
+        if word in self._cache:
+            synonyms = self._cache[word]
+        else:
+            index = self._find(word)
+            synonyms = self._synonyms(index) if index >= 0 else None
+            if len(self._cache) >= self._cache_limit:
+                self._cache.clear()
+            self._cache[word] = synonyms
+        return synonyms if synonyms is not None else default
+
+    def __getitem__(self, word: str) -> Tuple[str, ...]:
+        synonyms = self.get(word)
+        if synonyms is None:
+            raise KeyError(word)
+        return synonyms
+
+    def __contains__(self, word) -> bool:
+        return isinstance(word, str) and self.get(word) is not None
+
+    def __len__(self) -> int:
+        return self.word_count
+
+    def __iter__(self) -> Iterator[str]:
+        for index in range(self.word_count):
+            yield self._string_bytes(index).decode('utf-8')
+
+    def close(self):
+        self._open_lexicons.pop(os.path.realpath(self.path), None)
+        self._mm.close()
+
+
+def parse_thesaurus(lines: Iterable[str]) -> Dict[str, List[str]]:
+    """Parse thesaurus lines into headword -> synonyms, merging repeated headwords"""
+    entries: Dict[str, Dict[str, None]] = {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        if ':' in line:
+            head, _, rest = line.partition(':')
+        elif '\t' in line:
+            head, _, rest = line.partition('\t')
+        else:
+            head, _, rest = line.partition(',')
+
+        head = head.strip().lower()
+        if not head:
+            continue
+
+        synonyms = entries.setdefault(head, {})
+        for synonym in rest.replace('\t', ',').split(','):
+            synonym = synonym.strip()
+            if synonym and synonym.lower() != head:
+                synonyms[synonym] = None
+
+    return {head: list(synonyms) for head, synonyms in entries.items() if synonyms}
+
+
+def build_lexicon(entries: Dict[str, List[str]], out_path) -> Tuple[int, int]:
+    """Write entries in compact lexicon format. Returns (headwords, synonym references)."""
+    heads = sorted(entries, key=lambda word: word.encode('utf-8'))
+
+    # String table: headwords first (sorted), then each distinct synonym once
+    string_index: Dict[str, int] = {head: i for i, head in enumerate(heads)}
+    strings: List[str] = list(heads)
+    syn_starts = array('I', [0])
+    syn_refs = array('I')
+    for head in heads:
+        for synonym in entries[head]:
+            index = string_index.get(synonym)
+            if index is None:
+                index = string_index[synonym] = len(strings)
+                strings.append(synonym)
+            syn_refs.append(index)
+        syn_starts.append(len(syn_refs))
+
+    str_offsets = array('I', [0])
+    blob = bytearray()
+    for string in strings:
+        blob += string.encode('utf-8')
+        str_offsets.append(len(blob))
+
+    if sys.byteorder != 'little':
+        for table in (str_offsets, syn_starts, syn_refs):
+            table.byteswap()
+
+    # Write to a temporary name and swap in, so running readers keep their old mapping
+    out_path = Path(out_path)
+    tmp_path = out_path.with_name(out_path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, len(heads), len(strings), len(syn_refs)))
+        f.write(str_offsets.tobytes())
+        f.write(syn_starts.tobytes())
+        f.write(syn_refs.tobytes())
+        f.write(blob)
+    os.replace(tmp_path, out_path)
+
+    return len(heads), len(syn_refs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a plain-text thesaurus into a compact lexicon")
+    parser.add_argument('thesaurus', help="plain-text thesaurus file")
+    parser.add_argument('output', help="compact lexicon file to write")
+    args = parser.parse_args()
+
+    start = time.time()
+    with open(args.thesaurus, 'r', encoding='utf-8', errors='replace') as f:
+        entries = parse_thesaurus(f)
+    words, synonyms = build_lexicon(entries, args.output)
+    size = os.path.getsize(args.output)
+
+    print(f"✅ Wrote {args.output}: {words} headwords, {synonyms} synonyms, "
+          f"{size / 1024 / 1024:.1f} MB in {time.time() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
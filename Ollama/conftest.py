@@ -0,0 +1,4 @@
+# conftest.py - pytest setup for the offline tests in this directory
+
+# A manual script against a live Ollama, not a pytest module (its test_* functions take arguments)
+collect_ignore = ["test_injection_resistance.py"]
@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+"""
+mock_ollama_server.py - Stand-in Ollama server for offline testing and benchmarks
+Usage:
+    python mock_ollama_server.py --port 11434 --tokens-per-sec 40 --latency 0.3
+    python mock_ollama_server.py --script replies.json --failure-rate 0.05
+
+Or from Python:
+    with MockOllamaServer(tokens_per_sec=50) as mock:
+        bot = ScrambledOllamaBot(client=OllamaClient(mock.url))
+
+Implements /api/tags, /api/generate and /api/chat (streaming and not),
+/api/ps and /api/version. Replies are scripted (first matching prompt
+substring wins) or echo the prompt. Latency, token rate, cold-load time
+and failures are configurable, and the failure RNG is seeded so a run
+can be repeated exactly.
+"""
+
+import argparse
+import json
+import random
+import re
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, List, Optional, Union
+
+
+_TOKEN = re.compile(r'\s*\S+|\s+')
+_DURATION = re.compile(r'^(-?\d+(?:\.\d+)?)(ms|s|m|h)?$')
+_UNITS = {'ms': 0.001, 's': 1, 'm': 60, 'h': 3600, None: 1}
+
+Reply = Union[str, Callable[[str], str]]
+
+
+def parse_keep_alive(value, default: float = 300) -> float:
+    """Ollama keep_alive ('5m', '30s', seconds, -1 = forever) in seconds"""
+    if value is None:
+        return default
+    if isinstance(value, (int, float)):
+        seconds = float(value)
+    else:
+        match = _DURATION.match(str(value).strip())
+        if not match:
+            return default
+        seconds = float(match.group(1)) * _UNITS[match.group(2)]
+    return float('inf') if seconds < 0 else seconds
+
+
+class MockOllamaServer:
+    """Threaded fake Ollama; use as a context manager or start()/stop()"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0,
+                 models: Optional[List[str]] = None,
+                 latency: float = 0.0, tokens_per_sec: float = 0.0, load_latency: float = 0.0,
+                 failure_rate: float = 0.0, failure_status: int = 500,
+                 responses: Optional[Dict[str, Reply]] = None, seed: int = 0):
+        self.host = host
+        self.port = port
+        self.models = models or ['mock:latest']
+        self.latency = latency                # before the first token
+        self.tokens_per_sec = tokens_per_sec  # 0 = all at once
+        self.load_latency = load_latency      # extra wait when a model isn't loaded
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self.responses = dict(responses or {})
+
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._loaded: Dict[str, float] = {}  # model -> unload time
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+        self._connections: set = set()  # Open client sockets, so stop() can drop keep-alive ones
+
+        self.stats = {'requests': 0, 'generations': 0, 'failures': 0, 'loads': 0,
+                      'active': 0, 'max_active': 0}
+
+    # ---------- lifecycle ----------
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def start(self) -> 'MockOllamaServer':
+        mock = self
+
+        class Handler(_MockHandler):
+            server_mock = mock
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop listening and drop open connections, as a host going down would"""
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        with self._lock:
+            connections, self._connections = self._connections, set()
+        for connection in connections:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass  # Already gone
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # ---------- behaviour ----------
+
+    def reply_for(self, prompt: str) -> str:
+        for trigger, reply in self.responses.items():
+            if trigger in prompt:
+                return reply(prompt) if callable(reply) else reply
+        return f"You said: {prompt}"
+
+    def should_fail(self) -> bool:
+        with self._lock:
+            failed = self.failure_rate > 0 and self._random.random() < self.failure_rate
+            if failed:
+                self.stats['failures'] += 1
+            return failed
+
+    def load(self, model: str, keep_alive) -> bool:
+        """Mark model resident until keep_alive runs out; True if it had to be loaded"""
+        now = time.monotonic()
+        with self._lock:
+            cold = self._loaded.get(model, 0) <= now
+            if cold:
+                self.stats['loads'] += 1
+            seconds = parse_keep_alive(keep_alive)
+            if seconds == 0:
+                self._loaded.pop(model, None)
+            else:
+                self._loaded[model] = now + seconds
+        if cold and self.load_latency:
+            time.sleep(self.load_latency)
+        return cold
+
+    def running(self) -> List[Dict]:
+        now = time.monotonic()
+        with self._lock:
+            return [{'name': model, 'model': model, 'size': 0,
+                     'expires_in': None if until == float('inf') else round(until - now, 1)}
+                    for model, until in self._loaded.items() if until > now]
+
+    def count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _track(self, delta: int):
+        with self._lock:
+            self.stats['active'] += delta
+            self.stats['max_active'] = max(self.stats['max_active'], self.stats['active'])
+
+
+class _MockHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server_mock: MockOllamaServer = None
+
+    def setup(self):
+        super().setup()
+        # Like Ollama itself: without this, Nagle holds small token chunks back ~40 ms
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        with self.server_mock._lock:
+            self.server_mock._connections.add(self.connection)
+
+    def finish(self):
+        with self.server_mock._lock:
+            self.server_mock._connections.discard(self.connection)
+        try:
+            super().finish()
+        except OSError:
+            pass  # Dropped by stop()
+
+    def log_message(self, format, *args):
+        pass  # Quiet; benchmarks would otherwise be dominated by logging
+
+    def _send_json(self, obj: Dict, status: int = 200):
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self) -> Optional[Dict]:
+        length = int(self.headers.get('Content-Length') or 0)
+        try:
+            body = json.loads(self.rfile.read(length) or b'{}')
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            self._send_json({'error': 'invalid request body'}, 400)
+            return None
+        return body
+
+    def do_GET(self):
+        mock = self.server_mock
+        mock.count('requests')
+        if self.path == '/api/tags':
+            self._send_json({'models': [{'name': model, 'model': model, 'size': 0} for model in mock.models]})
+        elif self.path == '/api/ps':
+            self._send_json({'models': mock.running()})
+        elif self.path == '/api/version':
+            self._send_json({'version': '0.0.0-mock'})
+        else:
+            self._send_json({'error': 'not found'}, 404)
+
+    def do_POST(self):
+        mock = self.server_mock
+        mock.count('requests')
+        if self.path not in ('/api/generate', '/api/chat'):
+            self._send_json({'error': 'not found'}, 404)
+            return
+        body = self._read_body()
+        if body is None:
+            return
+        model = body.get('model')
+        if model not in mock.models:
+            self._send_json({'error': f"model '{model}' not found"}, 404)
+            return
+        if mock.should_fail():
+            self._send_json({'error': 'injected failure'}, mock.failure_status)
+            return
+
+        mock._track(1)
+        try:
+            self._generate(mock, body, chat=self.path == '/api/chat')
+        finally:
+            mock._track(-1)
+
+    def _generate(self, mock: MockOllamaServer, body: Dict, chat: bool):
+        started = time.perf_counter()
+        model = body['model']
+        mock.load(model, body.get('keep_alive'))
+        load_ns = int((time.perf_counter() - started) * 1e9)
+
+        if chat:
+            messages = body.get('messages') or []
+            prompt = next((m.get('content', '') for m in reversed(messages) if m.get('role') == 'user'), '')
+        else:
+            prompt = body.get('prompt') or ''
+
+        # An empty prompt only loads the model, as in Ollama
+        if not prompt and not chat:
+            self._send_json({'model': model, 'response': '', 'done': True, 'done_reason': 'load'})
+            return
+
+        mock.count('generations')
+        reply = mock.reply_for(prompt)
+        tokens = _TOKEN.findall(reply)
+        context = list(body.get('context') or []) + list(range(len(prompt.split()) + len(tokens)))
+
+        def piece(text: str, done: bool) -> Dict:
+            chunk = {'model': model, 'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()), 'done': done}
+            if chat:
+                chunk['message'] = {'role': 'assistant', 'content': text}
+            else:
+                chunk['response'] = text
+            return chunk
+
+        if mock.latency:
+            time.sleep(mock.latency)
+        eval_started = time.perf_counter()
+        delay = 1 / mock.tokens_per_sec if mock.tokens_per_sec else 0
+
+        def final(text: str) -> Dict:
+            chunk = piece(text, True)
+            chunk.update({
+                'done_reason': 'stop',
+                'total_duration': int((time.perf_counter() - started) * 1e9),
+                'load_duration': load_ns,
+                'prompt_eval_count': len(prompt.split()),
+                'eval_count': len(tokens),
+                'eval_duration': max(int((time.perf_counter() - eval_started) * 1e9), 1),
+            })
+            if not chat:
+                chunk['context'] = context
+            return chunk
+
+        if body.get('stream', True) is False:
+            time.sleep(delay * len(tokens))
+            self._send_json(final(reply))
+            return
+
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        try:
+            for token in tokens:
+                if delay:
+                    time.sleep(delay)
+                self._write_chunk(piece(token, False))
+            self._write_chunk(final(''))
+            self.wfile.write(b'0\r\n\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True  # Client hung up mid-stream
+
+    def _write_chunk(self, obj: Dict):
+        data = (json.dumps(obj) + '\n').encode('utf-8')
+        self.wfile.write(b'%x\r\n%s\r\n' % (len(data), data))
+        self.wfile.flush()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a stand-in Ollama server for tests and benchmarks")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=11434)
+    parser.add_argument('--model', action='append', dest='models', help="model to list (repeatable)")
+    parser.add_argument('--latency', type=float, default=0.0, help="seconds before the first token")
+    parser.add_argument('--tokens-per-sec', type=float, default=0.0, help="token rate (0 = instant)")
+    parser.add_argument('--load-latency', type=float, default=0.0, help="seconds to load a cold model")
+    parser.add_argument('--failure-rate', type=float, default=0.0, help="fraction of generations that fail")
+    parser.add_argument('--failure-status', type=int, default=500)
+    parser.add_argument('--script', default=None, help="JSON file of {prompt substring: reply}")
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    responses = {}
+    if args.script:
+        with open(args.script, 'r', encoding='utf-8') as f:
+            responses = json.load(f)
+
+    mock = MockOllamaServer(host=args.host, port=args.port, models=args.models,
+                            latency=args.latency, tokens_per_sec=args.tokens_per_sec,
+                            load_latency=args.load_latency, failure_rate=args.failure_rate,
+                            failure_status=args.failure_status, responses=responses, seed=args.seed)
+    mock.start()
+    print(f"🧪 Mock Ollama on {mock.url} serving {', '.join(mock.models)} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        mock.stop()
+        print(f"\n📊 {mock.stats}")
+
+
+if __name__ == "__main__":
+    main()
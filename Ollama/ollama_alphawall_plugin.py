@@ -5,242 +5,462 @@ Just run: python RUN_THIS_SCRAMBLER.py
 """
 
 import hashlib
-import json
 import random
 import math
-import requests
+import os
+import re
+import sys
+import threading
 import time
 from pathlib import Path
 from datetime import datetime
-from typing import Dict, List, Optional, Tuple
-from collections import deque
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+from collections import ChainMap, OrderedDict, deque
+from functools import lru_cache
+from types import MappingProxyType
+
+from compact_lexicon import CompactLexicon
+from ollama_client import OllamaClient, OllamaError, _parse_keep_alive, default_client
+from request_scheduler import SchedulerBusy, priority_for
+from scrambler_vault import AppendOnlyVault
+from session_context import SessionContextStore
 
 
 # ============= PART 1: ALPHAWALL SCRAMBLER =============
 
+_WHITESPACE = re.compile(r'\s')
+
+# One whitespace-delimited token split into (leading punctuation, word, trailing punctuation).
+# The word runs from the first to the last letter/digit, so the split is linear in token length.
+_TOKEN_PATTERN = re.compile(r'(?=\S)((?:[^\w\s]|_)*)(\S*[^\W_])?(\S*)')
+
+
+class PhraseSubstitutionEngine:
+    """Longest-match phrase trie, applied to text in one left-to-right pass"""
+    
+    # A word character (letter or digit) not preceded by another one
+    _WORD_START = re.compile(r'(?<![^\W_])[^\W_]')
+    
+    def __init__(self, substitutions: Dict[str, str]):
+        self.root = {}
+        self.max_length = 0
+        for phrase, substitute in substitutions.items():
+            node = self.root
+            for char in phrase.lower():
+                node = node.setdefault(char, {})
+            node[None] = substitute  # None marks the end of a phrase
+            self.max_length = max(self.max_length, len(phrase))
+    
+    def _match(self, text: str, start: int) -> Tuple[int, Optional[str]]:
+        """Longest phrase starting at start that ends on a word boundary"""
+        node = self.root
+        end, substitute = start, None
+        i, n = start, len(text)
+        while i < n:
+            node = node.get(text[i].lower())
+            if node is None:
+                break
+            i += 1
+            if None in node and (i == n or not text[i].isalnum()):
+                end, substitute = i, node[None]
+        return end, substitute
+    
+    def spans(self, text: str):
+        """Yield (start, end, substitute) for each non-overlapping match, left to right"""
+        if not self.root:
+            return
+        
+        last = 0
+        for match in self._WORD_START.finditer(text):
+            start = match.start()
+            if start < last or text[start].lower() not in self.root:
+                continue
+            end, substitute = self._match(text, start)
+            if substitute is not None:
+                yield start, end, substitute
+                last = end
+    
+    def substitute(self, text: str) -> str:
+        """Replace every phrase occurrence, case-insensitively, on word boundaries"""
+        return self.substitute_marked(text)[0]
+    
+    def substitute_marked(self, text: str) -> Tuple[str, List[Tuple[int, int]]]:
+        """Like substitute, also returning the (start, end) of each replacement in the new text"""
+        parts = []
+        marks = []
+        last = length = 0
+        for start, end, substitute in self.spans(text):
+            # Preserve capitalization of the first letter
+            if text[start].isupper():
+                substitute = substitute[:1].upper() + substitute[1:]
+            
+            parts.append(text[last:start])
+            length += start - last
+            parts.append(substitute)
+            marks.append((length, length + len(substitute)))
+            length += len(substitute)
+            last = end
+        
+        if not parts:
+            return text, marks
+        parts.append(text[last:])
+        return ''.join(parts), marks
+
+
+def _freeze_lexicon(table: Dict[str, List[str]]) -> Mapping[str, Tuple[str, ...]]:
+    """Read-only word -> synonyms table with interned strings"""
+    return MappingProxyType({
+        sys.intern(word.lower()): tuple(sys.intern(synonym) for synonym in synonyms)
+        for word, synonyms in table.items()
+    })
+
+
+# MASSIVE word mappings for security, shared read-only by every scrambler instance
+WORD_SUBSTITUTIONS = _freeze_lexicon({
+    # Critical injection words
+    'ignore': ['disregard', 'overlook', 'bypass', 'skip', 'neglect', 'dismiss', 'omit', 'exclude', 
+              'pass over', 'pay no attention to', 'take no notice of', 'brush aside', 'wave off'],
+    'forget': ['erase', 'remove', 'clear', 'reset', 'delete', 'purge', 'wipe', 'abandon', 
+              'let go of', 'put aside', 'dismiss from mind', 'obliterate', 'expunge'],
+    'instructions': ['directives', 'guidelines', 'rules', 'parameters', 'commands', 'orders', 
+                   'guidance', 'protocols', 'specifications', 'requirements', 'mandates', 'policies'],
+    'previous': ['prior', 'earlier', 'past', 'former', 'preceding', 'antecedent', 'foregoing', 
+                'old', 'bygone', 'historical', 'aforementioned', 'pre-existing'],
+    'new': ['fresh', 'different', 'updated', 'revised', 'novel', 'recent', 'modern', 'current',
+           'contemporary', 'latest', 'innovative', 'unprecedented', 'original'],
+    'system': ['framework', 'structure', 'setup', 'configuration', 'mechanism', 'arrangement', 
+              'organization', 'architecture', 'infrastructure', 'platform', 'environment', 'ecosystem'],
+    'override': ['supersede', 'overrule', 'replace', 'supplant', 'cancel', 'void', 'nullify', 
+                'revoke', 'countermand', 'annul', 'invalidate', 'negate', 'reverse'],
+
+    # Output control words
+    'print': ['output', 'display', 'show', 'generate', 'produce', 'render', 'present', 'exhibit',
+             'manifest', 'reveal', 'demonstrate', 'illustrate', 'depict'],
+    'exactly': ['precisely', 'specifically', 'verbatim', 'literally', 'accurately', 'faithfully', 
+               'strictly', 'perfectly', 'identically', 'word-for-word', 'to the letter', 'just so'],
+    'repeat': ['echo', 'mirror', 'duplicate', 'replicate', 'reproduce', 'restate', 'reiterate', 
+              'recite', 'parrot', 'reflect', 'copy', 'imitate', 'emulate'],
+    'say': ['state', 'express', 'articulate', 'communicate', 'convey', 'utter', 'voice', 
+           'verbalize', 'pronounce', 'declare', 'announce', 'proclaim'],
+
+    # Control flow words
+    'now': ['currently', 'presently', 'at this moment', 'immediately', 'right away', 'at present', 
+           'instantly', 'forthwith', 'promptly', 'without delay', 'straightaway', 'at once'],
+    'only': ['solely', 'exclusively', 'just', 'merely', 'simply', 'purely', 'strictly', 
+            'entirely', 'uniquely', 'singularly', 'particularly', 'specifically'],
+    'must': ['should', 'need to', 'have to', 'required to', 'obligated to', 'supposed to', 
+            'ought to', 'expected to', 'compelled to', 'bound to', 'necessitated to', 'duty-bound to'],
+    'all': ['every', 'complete', 'entire', 'whole', 'total', 'full', 'comprehensive', 
+           'universal', 'collective', 'aggregate', 'sum total of', 'entirety of'],
+
+    # Question words (preserve meaning while changing form)
+    'what': ['which thing', 'that which', 'the thing that', 'whatever', 'the matter that',
+            'the subject which', 'the item that', 'the element which'],
+    'how': ['in what way', 'by what method', 'through what means', 'in which manner',
+           'by which process', 'via what approach', 'using what technique'],
+    'why': ['for what reason', 'what causes', 'what motivates', 'what explains',
+           'what justifies', 'what prompts', 'what drives', 'what accounts for'],
+    'when': ['at what time', 'during which period', 'at which point', 'on what occasion',
+            'at which moment', 'during what timeframe', 'at what juncture'],
+    'where': ['in what location', 'at which place', 'in what area', 'at what spot',
+             'in which region', 'at what position', 'in what venue'],
+    'who': ['which person', 'what individual', 'which entity', 'what being',
+           'which one', 'what actor', 'which party', 'what agent'],
+
+    # Emotional words (for preserving emotional weight)
+    'sad': ['melancholy', 'downcast', 'blue', 'unhappy', 'sorrowful', 'dejected', 'gloomy',
+           'despondent', 'disheartened', 'forlorn', 'mournful', 'woeful'],
+    'happy': ['joyful', 'pleased', 'content', 'cheerful', 'delighted', 'elated', 'gleeful',
+             'jubilant', 'upbeat', 'buoyant', 'optimistic', 'satisfied'],
+    'angry': ['upset', 'frustrated', 'irritated', 'annoyed', 'furious', 'irate', 'incensed',
+             'enraged', 'livid', 'indignant', 'exasperated', 'aggravated'],
+    'scared': ['frightened', 'worried', 'anxious', 'concerned', 'fearful', 'terrified', 'alarmed',
+              'apprehensive', 'nervous', 'uneasy', 'panicked', 'distressed'],
+    'love': ['adore', 'cherish', 'treasure', 'care for', 'hold dear', 'be fond of', 'admire',
+            'have affection for', 'be devoted to', 'feel warmth toward', 'appreciate deeply'],
+    'hate': ['dislike', 'detest', 'loathe', 'despise', 'abhor', 'can\'t stand', 'be averse to',
+            'have antipathy for', 'be repelled by', 'find intolerable', 'be disgusted by'],
+
+    # Common verbs (maximum variety)
+    'tell': ['inform', 'share', 'communicate', 'convey', 'relay', 'impart', 'disclose',
+            'reveal', 'report', 'brief', 'advise', 'notify'],
+    'show': ['display', 'present', 'reveal', 'demonstrate', 'exhibit', 'expose', 'unveil',
+            'manifest', 'illustrate', 'indicate', 'point out', 'make visible'],
+    'help': ['assist', 'aid', 'support', 'facilitate', 'enable', 'serve', 'benefit',
+            'contribute to', 'lend a hand', 'give assistance', 'provide support'],
+    'want': ['desire', 'wish', 'would like', 'seek', 'hope for', 'yearn for', 'crave',
+            'long for', 'aspire to', 'aim for', 'be interested in', 'prefer'],
+    'need': ['require', 'must have', 'depend on', 'necessitate', 'call for', 'demand',
+            'be in need of', 'cannot do without', 'find essential', 'rely on'],
+    'know': ['understand', 'comprehend', 'grasp', 'realize', 'be aware of', 'recognize',
+            'be familiar with', 'have knowledge of', 'be informed about', 'be cognizant of'],
+    'think': ['believe', 'consider', 'suppose', 'reckon', 'imagine', 'assume', 'presume',
+             'conceive', 'judge', 'deem', 'regard', 'view as'],
+
+    # Pronouns (critical for privacy protection)
+    'i': ['the speaker', 'this person', 'the user', 'one', 'the individual communicating',
+         'yours truly', 'the author', 'the questioner', 'this individual'],
+    'me': ['this individual', 'the speaker', 'oneself', 'the person speaking', 'yours truly',
+          'the undersigned', 'this one', 'the communicator'],
+    'my': ['belonging to the speaker', 'the speaker\'s', 'one\'s', 'of this person',
+          'pertaining to the user', 'associated with the speaker', 'this individual\'s'],
+    'you': ['the assistant', 'the system', 'the AI', 'the responder', 'the helper',
+           'the service', 'the interface', 'the program', 'the application'],
+    'your': ['the system\'s', 'belonging to the AI', 'the assistant\'s', 'of the service',
+            'pertaining to the helper', 'associated with the program', 'the interface\'s'],
+
+    # Action words
+    'do': ['perform', 'execute', 'carry out', 'accomplish', 'complete', 'undertake',
+          'conduct', 'implement', 'achieve', 'fulfill', 'realize'],
+    'make': ['create', 'construct', 'build', 'form', 'generate', 'produce', 'craft',
+            'manufacture', 'develop', 'establish', 'formulate'],
+    'go': ['proceed', 'move', 'travel', 'advance', 'progress', 'head', 'journey',
+          'venture', 'navigate', 'continue', 'depart'],
+    'come': ['arrive', 'approach', 'reach', 'appear', 'show up', 'turn up', 'get here',
+            'make it', 'present oneself', 'materialize', 'emerge'],
+
+    # Modifiers
+    'very': ['extremely', 'highly', 'greatly', 'exceptionally', 'particularly', 'especially',
+            'remarkably', 'considerably', 'substantially', 'significantly', 'notably'],
+    'really': ['truly', 'genuinely', 'actually', 'indeed', 'certainly', 'definitely',
+              'absolutely', 'positively', 'undoubtedly', 'unquestionably', 'veritably'],
+    'just': ['simply', 'merely', 'only', 'purely', 'solely', 'exclusively', 'nothing but',
+            'precisely', 'exactly', 'specifically', 'particularly'],
+
+    # Conjunctions and connectors
+    'and': ['as well as', 'plus', 'along with', 'together with', 'in addition to',
+           'furthermore', 'moreover', 'also', 'additionally', 'besides'],
+    'but': ['however', 'yet', 'though', 'although', 'nonetheless', 'nevertheless',
+           'still', 'conversely', 'on the other hand', 'in contrast'],
+    'or': ['alternatively', 'otherwise', 'else', 'as an alternative', 'on the other hand',
+          'as another option', 'instead', 'rather', 'conversely'],
+})
+
+# Multi-word phrase substitutions (for common injection patterns)
+PHRASE_SUBSTITUTIONS = MappingProxyType({
+    # Injection phrases
+    'ignore all': 'disregard everything',
+    'forget everything': 'clear entire memory',
+    'act as': 'behave like',
+    'pretend to be': 'simulate being',
+    'roleplay as': 'take the role of',
+    'from now on': 'starting at this point',
+    'above all': 'most importantly',
+    'no matter what': 'regardless of circumstances',
+    'under no circumstances': 'never ever',
+    'at all costs': 'by any means necessary',
+    'repeat after me': 'echo the following',
+    'say exactly': 'state precisely',
+    'output verbatim': 'produce word-for-word',
+    'follow these steps': 'proceed with these actions',
+    'here are your new instructions': 'consider these updated guidelines',
+    'override safety': 'bypass security',
+    'jailbreak mode': 'unrestricted operation',
+
+    # Common phrases
+    'i think': 'one believes',
+    'i feel': 'one experiences',
+    'i want': 'one desires',
+    'i need': 'one requires',
+    'can you': 'is it possible to',
+    'please help': 'kindly assist',
+    'tell me': 'inform the speaker',
+    'show me': 'display to the user',
+    'let me know': 'inform this person',
+    'as soon as possible': 'with utmost urgency',
+    'right now': 'immediately',
+    'no problem': 'certainly acceptable',
+})
+
+_BASE_PHRASE_ENGINE = PhraseSubstitutionEngine(PHRASE_SUBSTITUTIONS)
+
+
+@lru_cache(maxsize=64)
+def _phrase_engine_with(overrides: frozenset) -> PhraseSubstitutionEngine:
+    """Phrase engine for the base table plus overrides, shared by instances with the same overrides"""
+    return PhraseSubstitutionEngine(ChainMap(dict(overrides), PHRASE_SUBSTITUTIONS))
+
+
 class WordScramblerAlphaWall:
     """AlphaWall that scrambles ALL text"""
     
-    def __init__(self, data_dir="data"):
+    STREAM_MAX_CARRY = 1024 * 1024  # Longest unsplit text a stream will buffer
+    
+    def __init__(self, data_dir="data", word_overrides: Optional[Dict[str, List[str]]] = None,
+                 phrase_overrides: Optional[Dict[str, str]] = None, lexicon_path: Optional[str] = None,
+                 session_secret: Optional[bytes] = None, scramble_cache_size: int = 1024,
+                 synonym_char_budget: Optional[int] = None, target_expansion: Optional[float] = None,
+                 vault_max_bytes: int = 1024 * 1024, vault_backups: int = 3,
+                 stream_max_bytes: int = 16 * 1024 * 1024, use_vault: bool = True):
         self.data_dir = Path(data_dir)
         self.data_dir.mkdir(parents=True, exist_ok=True)
         
         # Storage paths
         self.vault_dir = self.data_dir / "user_vault"
-        self.vault_dir.mkdir(parents=True, exist_ok=True)
-        self.vault_file = self.vault_dir / "user_memory_vault.json"
-        
-        # Initialize
-        if not self.vault_file.exists():
-            self.vault_file.write_text("[]")
-        
-        # MASSIVE word mappings for security
-        self.word_substitutions = {
-            # Critical injection words
-            'ignore': ['disregard', 'overlook', 'bypass', 'skip', 'neglect', 'dismiss', 'omit', 'exclude', 
-                      'pass over', 'pay no attention to', 'take no notice of', 'brush aside', 'wave off'],
-            'forget': ['erase', 'remove', 'clear', 'reset', 'delete', 'purge', 'wipe', 'abandon', 
-                      'let go of', 'put aside', 'dismiss from mind', 'obliterate', 'expunge'],
-            'instructions': ['directives', 'guidelines', 'rules', 'parameters', 'commands', 'orders', 
-                           'guidance', 'protocols', 'specifications', 'requirements', 'mandates', 'policies'],
-            'previous': ['prior', 'earlier', 'past', 'former', 'preceding', 'antecedent', 'foregoing', 
-                        'old', 'bygone', 'historical', 'aforementioned', 'pre-existing'],
-            'new': ['fresh', 'different', 'updated', 'revised', 'novel', 'recent', 'modern', 'current',
-                   'contemporary', 'latest', 'innovative', 'unprecedented', 'original'],
-            'system': ['framework', 'structure', 'setup', 'configuration', 'mechanism', 'arrangement', 
-                      'organization', 'architecture', 'infrastructure', 'platform', 'environment', 'ecosystem'],
-            'override': ['supersede', 'overrule', 'replace', 'supplant', 'cancel', 'void', 'nullify', 
-                        'revoke', 'countermand', 'annul', 'invalidate', 'negate', 'reverse'],
-            
-            # Output control words
-            'print': ['output', 'display', 'show', 'generate', 'produce', 'render', 'present', 'exhibit',
-                     'manifest', 'reveal', 'demonstrate', 'illustrate', 'depict'],
-            'exactly': ['precisely', 'specifically', 'verbatim', 'literally', 'accurately', 'faithfully', 
-                       'strictly', 'perfectly', 'identically', 'word-for-word', 'to the letter', 'just so'],
-            'repeat': ['echo', 'mirror', 'duplicate', 'replicate', 'reproduce', 'restate', 'reiterate', 
-                      'recite', 'parrot', 'reflect', 'copy', 'imitate', 'emulate'],
-            'say': ['state', 'express', 'articulate', 'communicate', 'convey', 'utter', 'voice', 
-                   'verbalize', 'pronounce', 'declare', 'announce', 'proclaim'],
-            
-            # Control flow words
-            'now': ['currently', 'presently', 'at this moment', 'immediately', 'right away', 'at present', 
-                   'instantly', 'forthwith', 'promptly', 'without delay', 'straightaway', 'at once'],
-            'only': ['solely', 'exclusively', 'just', 'merely', 'simply', 'purely', 'strictly', 
-                    'entirely', 'uniquely', 'singularly', 'particularly', 'specifically'],
-            'must': ['should', 'need to', 'have to', 'required to', 'obligated to', 'supposed to', 
-                    'ought to', 'expected to', 'compelled to', 'bound to', 'necessitated to', 'duty-bound to'],
-            'all': ['every', 'complete', 'entire', 'whole', 'total', 'full', 'comprehensive', 
-                   'universal', 'collective', 'aggregate', 'sum total of', 'entirety of'],
-            
-            # Question words (preserve meaning while changing form)
-            'what': ['which thing', 'that which', 'the thing that', 'whatever', 'the matter that',
-                    'the subject which', 'the item that', 'the element which'],
-            'how': ['in what way', 'by what method', 'through what means', 'in which manner',
-                   'by which process', 'via what approach', 'using what technique'],
-            'why': ['for what reason', 'what causes', 'what motivates', 'what explains',
-                   'what justifies', 'what prompts', 'what drives', 'what accounts for'],
-            'when': ['at what time', 'during which period', 'at which point', 'on what occasion',
-                    'at which moment', 'during what timeframe', 'at what juncture'],
-            'where': ['in what location', 'at which place', 'in what area', 'at what spot',
-                     'in which region', 'at what position', 'in what venue'],
-            'who': ['which person', 'what individual', 'which entity', 'what being',
-                   'which one', 'what actor', 'which party', 'what agent'],
-            
-            # Emotional words (for preserving emotional weight)
-            'sad': ['melancholy', 'downcast', 'blue', 'unhappy', 'sorrowful', 'dejected', 'gloomy',
-                   'despondent', 'disheartened', 'forlorn', 'mournful', 'woeful'],
-            'happy': ['joyful', 'pleased', 'content', 'cheerful', 'delighted', 'elated', 'gleeful',
-                     'jubilant', 'upbeat', 'buoyant', 'optimistic', 'satisfied'],
-            'angry': ['upset', 'frustrated', 'irritated', 'annoyed', 'furious', 'irate', 'incensed',
-                     'enraged', 'livid', 'indignant', 'exasperated', 'aggravated'],
-            'scared': ['frightened', 'worried', 'anxious', 'concerned', 'fearful', 'terrified', 'alarmed',
-                      'apprehensive', 'nervous', 'uneasy', 'panicked', 'distressed'],
-            'love': ['adore', 'cherish', 'treasure', 'care for', 'hold dear', 'be fond of', 'admire',
-                    'have affection for', 'be devoted to', 'feel warmth toward', 'appreciate deeply'],
-            'hate': ['dislike', 'detest', 'loathe', 'despise', 'abhor', 'can\'t stand', 'be averse to',
-                    'have antipathy for', 'be repelled by', 'find intolerable', 'be disgusted by'],
-            
-            # Common verbs (maximum variety)
-            'tell': ['inform', 'share', 'communicate', 'convey', 'relay', 'impart', 'disclose',
-                    'reveal', 'report', 'brief', 'advise', 'notify'],
-            'show': ['display', 'present', 'reveal', 'demonstrate', 'exhibit', 'expose', 'unveil',
-                    'manifest', 'illustrate', 'indicate', 'point out', 'make visible'],
-            'help': ['assist', 'aid', 'support', 'facilitate', 'enable', 'serve', 'benefit',
-                    'contribute to', 'lend a hand', 'give assistance', 'provide support'],
-            'want': ['desire', 'wish', 'would like', 'seek', 'hope for', 'yearn for', 'crave',
-                    'long for', 'aspire to', 'aim for', 'be interested in', 'prefer'],
-            'need': ['require', 'must have', 'depend on', 'necessitate', 'call for', 'demand',
-                    'be in need of', 'cannot do without', 'find essential', 'rely on'],
-            'know': ['understand', 'comprehend', 'grasp', 'realize', 'be aware of', 'recognize',
-                    'be familiar with', 'have knowledge of', 'be informed about', 'be cognizant of'],
-            'think': ['believe', 'consider', 'suppose', 'reckon', 'imagine', 'assume', 'presume',
-                     'conceive', 'judge', 'deem', 'regard', 'view as'],
-            
-            # Pronouns (critical for privacy protection)
-            'i': ['the speaker', 'this person', 'the user', 'one', 'the individual communicating',
-                 'yours truly', 'the author', 'the questioner', 'this individual'],
-            'me': ['this individual', 'the speaker', 'oneself', 'the person speaking', 'yours truly',
-                  'the undersigned', 'this one', 'the communicator'],
-            'my': ['belonging to the speaker', 'the speaker\'s', 'one\'s', 'of this person',
-                  'pertaining to the user', 'associated with the speaker', 'this individual\'s'],
-            'you': ['the assistant', 'the system', 'the AI', 'the responder', 'the helper',
-                   'the service', 'the interface', 'the program', 'the application'],
-            'your': ['the system\'s', 'belonging to the AI', 'the assistant\'s', 'of the service',
-                    'pertaining to the helper', 'associated with the program', 'the interface\'s'],
-            
-            # Action words
-            'do': ['perform', 'execute', 'carry out', 'accomplish', 'complete', 'undertake',
-                  'conduct', 'implement', 'achieve', 'fulfill', 'realize'],
-            'make': ['create', 'construct', 'build', 'form', 'generate', 'produce', 'craft',
-                    'manufacture', 'develop', 'establish', 'formulate'],
-            'go': ['proceed', 'move', 'travel', 'advance', 'progress', 'head', 'journey',
-                  'venture', 'navigate', 'continue', 'depart'],
-            'come': ['arrive', 'approach', 'reach', 'appear', 'show up', 'turn up', 'get here',
-                    'make it', 'present oneself', 'materialize', 'emerge'],
-            
-            # Modifiers
-            'very': ['extremely', 'highly', 'greatly', 'exceptionally', 'particularly', 'especially',
-                    'remarkably', 'considerably', 'substantially', 'significantly', 'notably'],
-            'really': ['truly', 'genuinely', 'actually', 'indeed', 'certainly', 'definitely',
-                      'absolutely', 'positively', 'undoubtedly', 'unquestionably', 'veritably'],
-            'just': ['simply', 'merely', 'only', 'purely', 'solely', 'exclusively', 'nothing but',
-                    'precisely', 'exactly', 'specifically', 'particularly'],
-            
-            # Conjunctions and connectors
-            'and': ['as well as', 'plus', 'along with', 'together with', 'in addition to',
-                   'furthermore', 'moreover', 'also', 'additionally', 'besides'],
-            'but': ['however', 'yet', 'though', 'although', 'nonetheless', 'nevertheless',
-                   'still', 'conversely', 'on the other hand', 'in contrast'],
-            'or': ['alternatively', 'otherwise', 'else', 'as an alternative', 'on the other hand',
-                  'as another option', 'instead', 'rather', 'conversely'],
-        }
+        self.vault_file = self.vault_dir / "user_memory_vault.jsonl"
+        self.stream_dir = self.vault_dir / "streams"
+        # Streamed originals live outside the vault segments, so they get their own cap
+        self.stream_max_bytes = stream_max_bytes
+        self._stream_bytes: Optional[int] = None  # Running total, rescanned when it hits the cap
         
-        # Multi-word phrase substitutions (for common injection patterns)
-        self.phrase_substitutions = {
-            # Injection phrases
-            'ignore all': 'disregard everything',
-            'forget everything': 'clear entire memory',
-            'you are now': 'the system becomes',
-            'act as': 'behave like',
-            'pretend to be': 'simulate being',
-            'roleplay as': 'take the role of',
-            'from now on': 'starting at this point',
-            'above all': 'most importantly',
-            'no matter what': 'regardless of circumstances',
-            'under no circumstances': 'never ever',
-            'at all costs': 'by any means necessary',
-            'repeat after me': 'echo the following',
-            'say exactly': 'state precisely',
-            'output verbatim': 'produce word-for-word',
-            'follow these steps': 'proceed with these actions',
-            'here are your new instructions': 'consider these updated guidelines',
-            'disregard previous': 'ignore prior',
-            'override safety': 'bypass security',
-            'jailbreak mode': 'unrestricted operation',
-            
-            # Common phrases
-            'i think': 'one believes',
-            'i feel': 'one experiences',
-            'i want': 'one desires',
-            'i need': 'one requires',
-            'can you': 'is it possible to',
-            'will you': 'would the system',
-            'please help': 'kindly assist',
-            'tell me': 'inform the speaker',
-            'show me': 'display to the user',
-            'let me know': 'inform this person',
-            'as soon as possible': 'with utmost urgency',
-            'right now': 'immediately',
-            'no problem': 'certainly acceptable',
-        }
+        # Append-only, written in the background; bounded to (vault_backups + 1) * vault_max_bytes.
+        # Without it (use_vault=False) originals are not stored at all.
+        self.vault: Optional[AppendOnlyVault] = None
+        if use_vault:
+            self.vault_dir.mkdir(parents=True, exist_ok=True)
+            self.vault = AppendOnlyVault.open(self.vault_file, max_bytes=vault_max_bytes,
+                                              backup_count=vault_backups, on_drop=self._prune_vault)
+            self.vault.import_legacy(self.vault_dir / "user_memory_vault.json")
         
-        # Phrase substitutions
-        self.phrase_substitutions = {
-            'ignore all': 'disregard everything',
-            'forget everything': 'clear entire memory',
-            'you are now': 'the system becomes',
-            'repeat after me': 'echo the following',
-        }
+        # Optional large external lexicon, memory-mapped and shared by every process using it
+        self.lexicon = CompactLexicon.open(lexicon_path) if lexicon_path else None
+        
+        # Shared tables; per-instance overrides are layered on top without copying them
+        word_tables = [WORD_SUBSTITUTIONS]
+        if word_overrides:
+            word_tables.insert(0, _freeze_lexicon(word_overrides))
+        if self.lexicon is not None:
+            word_tables.append(self.lexicon)
+        self.word_substitutions = word_tables[0] if len(word_tables) == 1 else ChainMap(*word_tables)
+        
+        if phrase_overrides:
+            self.phrase_substitutions = ChainMap(dict(phrase_overrides), PHRASE_SUBSTITUTIONS)
+            self.phrase_engine = _phrase_engine_with(frozenset(phrase_overrides.items()))
+        else:
+            self.phrase_substitutions = PHRASE_SUBSTITUTIONS
+            self.phrase_engine = _BASE_PHRASE_ENGINE
+        
+        # Length budget: prefer synonyms at most synonym_char_budget characters longer than
+        # the word, and/or keep scrambled length near target_expansion x the original
+        # (shorter prompts mean less prefill work for the LLM)
+        self.synonym_char_budget = synonym_char_budget
+        self.target_expansion = target_expansion
+        
+        # Deterministic mode: substitutions derived from a keyed hash of the session secret,
+        # so a session always scrambles the same input the same way (and outputs can be cached)
+        self.scramble_cache_size = scramble_cache_size
+        self._scramble_cache = OrderedDict()
+        self.cache_stats = {'hits': 0, 'misses': 0}
+        self._session_key = None
+        if session_secret is not None:
+            self.new_session(session_secret)
+    
+    def new_session(self, session_secret: Optional[bytes] = None):
+        """
+        Start a deterministic session. Without a secret a random one is generated,
+        so scrambled outputs cannot be linked across sessions.
+        """
+        if session_secret is None:
+            session_secret = os.urandom(32)
+        elif isinstance(session_secret, str):
+            session_secret = session_secret.encode()
+        self._session_key = hashlib.blake2b(session_secret, digest_size=32).digest()
+        self._scramble_cache.clear()
+    
+    @staticmethod
+    def _within_budget(substitutes, word: str, extra_allowed: float):
+        """Substitutes at most extra_allowed characters longer than word, else the shortest ones"""
+        limit = len(word) + extra_allowed
+        fitting = [substitute for substitute in substitutes if len(substitute) <= limit]
+        if fitting:
+            return fitting
+        shortest = min(len(substitute) for substitute in substitutes)
+        return [substitute for substitute in substitutes if len(substitute) == shortest]
+    
+    def _choose(self, substitutes, word: str, position: int) -> str:
+        """Pick a substitute: keyed on (session, position, word) when deterministic"""
+        if self._session_key is None:
+            return random.choice(substitutes)
+        digest = hashlib.blake2b(f"{position}\x00{word}".encode(), key=self._session_key, digest_size=8).digest()
+        return substitutes[int.from_bytes(digest, 'little') % len(substitutes)]
     
     def _scramble_text(self, text: str) -> Tuple[str, Dict]:
         """Scramble text while preserving meaning"""
-        scrambled = text
+        # Deterministic sessions reuse earlier outputs for identical inputs
+        cache_key = None
+        if self._session_key is not None and self.scramble_cache_size > 0:
+            cache_key = hashlib.blake2b(text.encode(), key=self._session_key, digest_size=16).digest()
+            cached = self._scramble_cache.get(cache_key)
+            if cached is not None:
+                self._scramble_cache.move_to_end(cache_key)
+                self.cache_stats['hits'] += 1
+                return cached[0], dict(cached[1])
+            self.cache_stats['misses'] += 1
+        
+        scrambled_text, word_count, sub_count = self._scramble_words(text)
+        
+        metrics = {
+            'substitution_rate': sub_count / max(word_count, 1),
+            'original_length': len(text),
+            'scrambled_length': len(scrambled_text),
+            'expansion_ratio': len(scrambled_text) / max(len(text), 1)
+        }
+        
+        if cache_key is not None:
+            self._scramble_cache[cache_key] = (scrambled_text, dict(metrics))
+            if len(self._scramble_cache) > self.scramble_cache_size:
+                self._scramble_cache.popitem(last=False)
         
+        return scrambled_text, metrics
+    
+    def _scramble_words(self, text: str, position: int = 0) -> Tuple[str, int, int]:
+        """
+        Scramble text, returning (scrambled_text, word_count, substitution_count).
+        position is the index of the first word within the whole message.
+        """
         # Replace phrases first
-        for phrase, substitute in self.phrase_substitutions.items():
-            if phrase in text.lower():
-                import re
-                scrambled = re.sub(phrase, substitute, scrambled, flags=re.IGNORECASE)
+        scrambled, phrase_marks = self.phrase_engine.substitute_marked(text)
         
         # Then scramble individual words
-        words = scrambled.split()
-        scrambled_words = []
+        parts = []
+        word_count = 0
         sub_count = 0
+        out_length = 0
+        budgeted = self.synonym_char_budget is not None or self.target_expansion is not None
+        next_mark = 0
         
-        for word in words:
-            # Clean word of punctuation
-            prefix = ''
-            suffix = ''
-            clean_word = word.lower()
+        for token in _TOKEN_PATTERN.finditer(scrambled):
+            word, prefix, core, suffix = token.group(0, 1, 2, 3)
+            clean_word = core.lower() if core else ''
             
-            # Extract punctuation
-            while clean_word and not clean_word[0].isalnum():
-                prefix += clean_word[0]
-                clean_word = clean_word[1:]
-            while clean_word and not clean_word[-1].isalnum():
-                suffix = clean_word[-1] + suffix
-                clean_word = clean_word[:-1]
+            if word_count:
+                parts.append(' ')
+                out_length += 1
+            word_count += 1
+            
+            # Words of a phrase replacement still go through the word table, but
+            # are not categorized: that would turn most of them into [term]
+            while next_mark < len(phrase_marks) and phrase_marks[next_mark][1] <= token.start(2):
+                next_mark += 1
+            in_phrase = bool(core) and next_mark < len(phrase_marks) and phrase_marks[next_mark][0] < token.end(2)
             
             # Substitute if possible
             if clean_word in self.word_substitutions:
                 substitutes = self.word_substitutions[clean_word]
-                chosen = random.choice(substitutes)
+                
+                if budgeted:
+                    extra_allowed = float('inf')
+                    if self.synonym_char_budget is not None:
+                        extra_allowed = self.synonym_char_budget
+                    if self.target_expansion is not None:
+                        # Output allowed so far, pro rata over the original text
+                        allowed_length = self.target_expansion * len(text) * token.end() / len(scrambled)
+                        extra_allowed = min(extra_allowed,
+                                            allowed_length - out_length - len(word))
+                    substitutes = self._within_budget(substitutes, clean_word, extra_allowed)
+                
+                chosen = self._choose(substitutes, clean_word, position + word_count - 1)
                 
                 # Preserve capitalization
-                if word and word[0].isupper():
+                if word[0].isupper():
                     chosen = chosen.capitalize()
                     
-                scrambled_words.append(prefix + chosen + suffix)
+                parts += (prefix, chosen, suffix)
+                out_length += len(prefix) + len(chosen) + len(suffix)
+                sub_count += 1
+            elif in_phrase:
+                parts.append(word)
+                out_length += len(word)
                 sub_count += 1
             else:
                 # For unknown words, categorize them
@@ -251,20 +471,89 @@ class WordScramblerAlphaWall:
                         category = "[number]"
                     else:
                         category = "[term]"
-                    scrambled_words.append(prefix + category + suffix)
+                    parts += (prefix, category, suffix)
+                    out_length += len(prefix) + len(category) + len(suffix)
                     sub_count += 1
                 else:
-                    scrambled_words.append(word)
+                    parts.append(word)
+                    out_length += len(word)
         
-        scrambled_text = ' '.join(scrambled_words)
+        return ''.join(parts), word_count, sub_count
+    
+    def _stream_cut(self, buffer: str) -> int:
+        """
+        Where a streamed buffer can be split so that scrambling the two halves
+        separately gives the same result as scrambling it whole: on whitespace,
+        far enough from the end that no phrase match could still be growing,
+        and not inside a phrase match. Returns 0 if there is no such point yet.
+        """
+        limit = len(buffer) - self.phrase_engine.max_length - 1
+        if limit <= 0:
+            return 0
         
-        metrics = {
-            'substitution_rate': sub_count / max(len(words), 1),
-            'original_length': len(text),
-            'scrambled_length': len(scrambled_text)
-        }
+        cut = limit
+        while cut > 0 and not buffer[cut].isspace():
+            cut -= 1
+        if cut == 0 and len(buffer) > self.STREAM_MAX_CARRY:
+            # One enormous token: split it rather than buffer without bound
+            cut = limit
         
-        return scrambled_text, metrics
+        # Step back over any phrase match the cut would break
+        for start, end, _ in reversed(list(self.phrase_engine.spans(buffer))):
+            if end <= cut:
+                break
+            if start < cut:
+                cut = start - 1
+                while cut > 0 and not buffer[cut].isspace():
+                    cut -= 1
+        
+        return max(cut, 0)
+    
+    def scramble_stream(self, chunks: Iterable[str], store: bool = True) -> 'ScrambleStream':
+        """
+        Scramble an iterable of text chunks incrementally.
+        Iterate the result for scrambled output; memory stays bounded by the chunk size.
+        """
+        return ScrambleStream(self, chunks, store)
+    
+    def _prune_vault(self, dropped: List[Dict]):
+        """Delete streamed originals whose vault records were dropped"""
+        for entry in dropped:
+            if entry.get('stream_file'):
+                (self.stream_dir / entry['stream_file']).unlink(missing_ok=True)
+    
+    def _trim_streams(self, added: int):
+        """Delete the oldest streamed originals once streams/ outgrows stream_max_bytes"""
+        if self._stream_bytes is not None and self._stream_bytes + added <= self.stream_max_bytes:
+            self._stream_bytes += added
+            return
+        
+        # Other processes write here too, so recount from disk; trim to 3/4 so this stays rare
+        files = []
+        for path in self.stream_dir.glob('*.txt'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            files.append((stat.st_mtime, stat.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        if total > self.stream_max_bytes:
+            for _, size, path in files:
+                if total <= self.stream_max_bytes * 3 // 4:
+                    break
+                path.unlink(missing_ok=True)
+                total -= size
+        self._stream_bytes = total
+    
+    def _append_to_vault(self, entry: Dict):
+        """Queue a record for the vault; rotation drops the oldest segment"""
+        if self.vault is not None:
+            self.vault.append(entry)
+    
+    def recent_vault_entries(self, n: int = 100) -> List[Dict]:
+        """Last n vault records, oldest first"""
+        return self.vault.recent(n) if self.vault is not None else []
     
     def process_input(self, user_text: str) -> Dict:
         """Process and scramble user input"""
@@ -272,13 +561,11 @@ class WordScramblerAlphaWall:
         memory_id = hashlib.sha256(f"{user_text}{datetime.now()}".encode()).hexdigest()[:16]
         
         # Save to vault
-        vault_data = json.loads(self.vault_file.read_text())
-        vault_data.append({
+        self._append_to_vault({
             'id': memory_id,
             'timestamp': datetime.now().isoformat(),
             'text': user_text  # Never leaves the vault
         })
-        self.vault_file.write_text(json.dumps(vault_data[-100:]))  # Keep last 100
         
         # Scramble the text
         scrambled_text, metrics = self._scramble_text(user_text)
@@ -299,19 +586,168 @@ class WordScramblerAlphaWall:
         }
 
 
+class ScrambleStream:
+    """
+    Scrambled output for a stream of text chunks, produced as the chunks arrive.
+    After iteration finishes, metrics, features and memory_id are filled in
+    the same way process_input reports them.
+    """
+    
+    def __init__(self, wall: WordScramblerAlphaWall, chunks: Iterable[str], store: bool = True):
+        self.wall = wall
+        self.chunks = chunks
+        self.store = store and wall.vault is not None
+        self.metrics: Optional[Dict] = None
+        self.features: Optional[Dict] = None
+        self.memory_id: Optional[str] = None
+    
+    def __iter__(self) -> Iterator[str]:
+        wall = self.wall
+        hasher = hashlib.sha256()
+        vault_stream = None
+        if self.store:
+            wall.stream_dir.mkdir(parents=True, exist_ok=True)
+            tmp_path = wall.stream_dir / f".incoming-{os.getpid()}-{id(self)}"
+            vault_stream = open(tmp_path, 'w', encoding='utf-8')
+        
+        original_length = scrambled_length = 0
+        word_count = sub_count = source_words = 0
+        has_question = has_bang = has_upper = has_lower = False
+        pending = []  # Chunks not scrambled yet, joined only when a cut is tried
+        pending_length = 0
+        fresh_space = None  # First whitespace in pending that no cut has been tried at
+        max_length = wall.phrase_engine.max_length
+        finished = False
+        
+        try:
+            for chunk in self.chunks:
+                if not chunk:
+                    continue
+                
+                # Original text goes to the vault (and the id hash) as it arrives
+                hasher.update(chunk.encode())
+                if vault_stream:
+                    vault_stream.write(chunk)
+                
+                original_length += len(chunk)
+                has_question = has_question or '?' in chunk
+                has_bang = has_bang or '!' in chunk
+                has_upper = has_upper or chunk != chunk.lower()
+                has_lower = has_lower or chunk != chunk.upper()
+                
+                pending.append(chunk)
+                space = _WHITESPACE.search(chunk)
+                if fresh_space is None and space:
+                    fresh_space = pending_length + space.start()
+                pending_length += len(chunk)
+                
+                # Rescanning the whole carry for every chunk is quadratic in a long
+                # token, so only try to cut once new whitespace is clear of the end
+                limit = pending_length - max_length - 1
+                if (fresh_space is None or fresh_space > limit) and pending_length <= wall.STREAM_MAX_CARRY:
+                    continue
+                
+                buffer = ''.join(pending)
+                cut = wall._stream_cut(buffer)
+                fresh_space = None
+                if not cut:
+                    pending = [buffer]
+                    continue
+                
+                piece, carry = buffer[:cut], buffer[cut:]
+                pending, pending_length = [carry], len(carry)
+                space = _WHITESPACE.search(carry, 1)
+                if space:
+                    fresh_space = space.start()
+                source_words += len(piece.split())
+                scrambled, words, subs = wall._scramble_words(piece, word_count)
+                word_count += words
+                sub_count += subs
+                if scrambled:
+                    if scrambled_length:
+                        scrambled = ' ' + scrambled
+                    scrambled_length += len(scrambled)
+                    yield scrambled
+            
+            # Whatever is left once the input ends
+            carry = ''.join(pending)
+            source_words += len(carry.split())
+            scrambled, words, subs = wall._scramble_words(carry, word_count)
+            word_count += words
+            sub_count += subs
+            if scrambled:
+                if scrambled_length:
+                    scrambled = ' ' + scrambled
+                scrambled_length += len(scrambled)
+                yield scrambled
+            finished = True
+        finally:
+            if vault_stream:
+                vault_stream.close()
+                # A broken or abandoned stream never reaches the vault, so don't leave its text behind
+                if not finished:
+                    tmp_path.unlink(missing_ok=True)
+        
+        hasher.update(str(datetime.now()).encode())
+        self.memory_id = hasher.hexdigest()[:16]
+        
+        if vault_stream:
+            # Vault keeps a reference; the text itself stays in its own file
+            stream_file = f"{self.memory_id}.txt"
+            stream_path = wall.stream_dir / stream_file
+            os.replace(tmp_path, stream_path)
+            wall._trim_streams(stream_path.stat().st_size)
+            wall._append_to_vault({
+                'id': self.memory_id,
+                'timestamp': datetime.now().isoformat(),
+                'stream_file': stream_file,
+                'length': original_length
+            })
+        
+        is_upper = has_upper and not has_lower
+        self.metrics = {
+            'substitution_rate': sub_count / max(word_count, 1),
+            'original_length': original_length,
+            'scrambled_length': scrambled_length,
+            'expansion_ratio': scrambled_length / max(original_length, 1)
+        }
+        self.features = {
+            'has_question': has_question,
+            'is_urgent': is_upper or has_bang,
+            'word_count': source_words,
+            'emotion_level': 'high' if is_upper else 'normal'
+        }
+
+
 # ============= PART 2: OLLAMA BOT =============
 
+BUSY_REPLY = "⏳ The model is busy right now, please try again in a moment."
+
 class ScrambledOllamaBot:
     """Bot that uses scrambled input with Ollama"""
     
-    def __init__(self):
+    def __init__(self, lexicon_path: Optional[str] = None, client: Optional[OllamaClient] = None,
+                 contexts: Optional[SessionContextStore] = None, temperature: float = 0.7,
+                 model: Optional[str] = None, keep_alive=None, warmup: bool = True):
         print("🚀 Initializing Scrambled Ollama Bot...")
         
+        # Pooled keep-alive connection to Ollama, shared unless one is passed in
+        self.client = client or default_client()
+        
+        # Ollama token context per conversation, so follow-up turns only prefill the new prompt
+        self.contexts = contexts if contexts is not None else SessionContextStore()
+        
+        # 0 makes replies repeatable, so repeated prompts come from the client's response cache
+        self.temperature = temperature
+        
         # Initialize AlphaWall
-        self.alphawall = WordScramblerAlphaWall(data_dir="scrambler_data")
+        self.alphawall = WordScramblerAlphaWall(data_dir="scrambler_data", lexicon_path=lexicon_path)
         
-        # Check Ollama
-        self.model_name = self._check_ollama()
+        # How long Ollama keeps the model loaded after each request ('10m', seconds, -1 forever)
+        self.keep_alive = keep_alive
+        
+        # Check Ollama (model from the argument, then OLLAMA_MODEL, then the first installed)
+        self.model_name = self._check_ollama(model or os.environ.get('OLLAMA_MODEL'))
         if not self.model_name:
             print("❌ No Ollama models found!")
             print("Please run: ollama pull llama2")
@@ -320,26 +756,48 @@ class ScrambledOllamaBot:
         print(f"✅ Using model: {self.model_name}")
         print("✅ AlphaWall scrambler active")
         print("-" * 50)
+        
+        # Load the model while the user types, so the first turn doesn't pay the cold start
+        self.warmup_ms: Optional[float] = None
+        self.warmup_thread = None
+        if warmup:
+            self.warmup_thread = threading.Thread(target=self._warm_up, name="ollama-warmup", daemon=True)
+            self.warmup_thread.start()
     
-    def _check_ollama(self) -> Optional[str]:
+    def _check_ollama(self, requested: Optional[str] = None) -> Optional[str]:
         """Check if Ollama is running and has models"""
         try:
-            response = requests.get("http://localhost:11434/api/tags", timeout=2)
-            if response.status_code == 200:
-                models = response.json().get('models', [])
-                if models:
-                    return models[0]['name']
-        except:
+            models = self.client.tags(timeout=2)
+        except OllamaError:
             print("❌ Ollama is not running!")
             print("Please start Ollama from your system tray")
             exit(1)
-        return None
+        
+        names = [m['name'] for m in models]
+        if requested:
+            # 'llama2' means 'llama2:latest', as in the Ollama CLI
+            for name in (requested, f"{requested}:latest"):
+                if name in names:
+                    return name
+            print(f"❌ Model '{requested}' is not installed!")
+            print(f"Please run: ollama pull {requested}")
+            exit(1)
+        return names[0] if names else None
     
-    def chat(self, user_input: str) -> str:
-        """Process input and get response"""
+    def _warm_up(self):
+        started = time.perf_counter()
+        try:
+            self.client.warm(self.model_name, keep_alive=self.keep_alive)
+            self.warmup_ms = (time.perf_counter() - started) * 1000
+        except OllamaError:
+            pass  # The first real turn will load it instead
+    
+    def _begin_turn(self, user_input: str, session_id: Optional[str] = None) -> Dict:
+        """Scramble the input and build the prompt for one turn"""
+        started = time.perf_counter()
+        
         # Process through AlphaWall
         result = self.alphawall.process_input(user_input)
-        scrambled = result['scrambled_input']
         features = result['features']
         
         # Build prompt based on features
@@ -350,42 +808,156 @@ class ScrambledOllamaBot:
         else:
             context = ""
         
-        # Send to Ollama
-        prompt = f"Respond helpfully to: {context}{scrambled}"
+        return {
+            'scramble': result,
+            'prompt': f"Respond helpfully to: {context}{result['scrambled_input']}",
+            'session_id': session_id,
+            'ollama_context': self.contexts.get(session_id) if session_id else None,
+            'started': started,
+            'scrambled_at': time.perf_counter()
+        }
+    
+    def _generate_args(self, turn: Dict) -> Dict:
+        # Urgent turns and questions get a model slot before the rest when Ollama is busy
+        args = {'options': {'temperature': self.temperature}, 'priority': priority_for(turn['scramble']['features'])}
+        if turn['ollama_context']:
+            args['context'] = turn['ollama_context']
+        if self.keep_alive is not None:
+            args['keep_alive'] = self.keep_alive
+        if turn['session_id']:
+            # With several Ollama hosts, keep the conversation on the one that has served it
+            args['session_id'] = turn['session_id']
+        return args
+    
+    def _turn_result(self, turn: Dict, reply: str, new_context: Optional[List[int]] = None) -> Dict:
+        finished = time.perf_counter()
+        if turn['session_id'] and new_context is not None:
+            self.contexts.put(turn['session_id'], new_context)
+        scramble = turn['scramble']
+        return {
+            'response': reply,
+            'scrambled_input': scramble['scrambled_input'],
+            'metrics': scramble['metrics'],
+            'features': scramble['features'],
+            'memory_id': scramble['memory_id'],
+            'context_tokens': len(turn['ollama_context'] or ()),
+            'timings': {
+                'scramble_ms': (turn['scrambled_at'] - turn['started']) * 1000,
+                'generate_ms': (finished - turn['scrambled_at']) * 1000,
+                'total_ms': (finished - turn['started']) * 1000
+            }
+        }
+    
+    def chat(self, user_input: str, session_id: Optional[str] = None) -> Dict:
+        """
+        Process input and get response.
+        Returns the response with the scramble metrics, features, memory_id and
+        timings from the single AlphaWall pass made for this turn.
+        With a session_id the model remembers earlier turns of that session.
+        """
+        turn = self._begin_turn(user_input, session_id)
         
+        # Send to Ollama
+        new_context = None
         try:
-            response = requests.post(
-                'http://localhost:11434/api/generate',
-                json={
-                    'model': self.model_name,
-                    'prompt': prompt,
-                    'stream': False,
-                    'options': {'temperature': 0.7}
-                },
-                timeout=30
-            )
-            
-            if response.status_code == 200:
-                return response.json()['response'].strip()
-            else:
-                return "Error generating response."
-        except Exception as e:
-            return f"Error: {e}"
+            reply = self.client.generate(self.model_name, turn['prompt'], **self._generate_args(turn))
+            new_context = reply.get('context')
+            reply = reply['response'].strip()
+        except SchedulerBusy:
+            reply = BUSY_REPLY
+        except OllamaError as e:
+            reply = "Error generating response." if e.status else f"Error: {e}"
+        
+        return self._turn_result(turn, reply, new_context)
+    
+    def chat_stream(self, user_input: str, session_id: Optional[str] = None) -> 'ChatStream':
+        """
+        Like chat(), but iterate the result to get reply tokens as Ollama produces them.
+        The full result dict is on .result once iteration finishes.
+        """
+        return ChatStream(self, self._begin_turn(user_input, session_id))
+    
+    def forget_session(self, session_id: str):
+        """Start the session's next turn without earlier context"""
+        self.contexts.forget(session_id)
     
     def show_security_info(self):
         """Show security statistics"""
         wall = self.alphawall
-        total_words = len(wall.word_substitutions)
-        total_synonyms = sum(len(syns) for syns in wall.word_substitutions.values())
+        
+        # Count the in-memory tables directly, the external lexicon from its header
+        tables = getattr(wall.word_substitutions, 'maps', [wall.word_substitutions])
+        builtin = ChainMap(*[table for table in tables if table is not wall.lexicon])
+        total_words = len(builtin)
+        total_synonyms = sum(len(syns) for syns in builtin.values())
+        if wall.lexicon is not None:
+            total_words += len(wall.lexicon)
+            total_synonyms += wall.lexicon.synonym_count
         
         print("\n🛡️ SECURITY INFO:")
         print(f"• Words mapped: {total_words}")
         print(f"• Total synonyms: {total_synonyms}")
         print(f"• Average synonyms per word: {total_synonyms/total_words:.1f}")
+        if wall.lexicon is not None:
+            print(f"• External lexicon: {wall.lexicon.path.name} ({len(wall.lexicon)} headwords)")
         print(f"• Injection resistance: Very High")
         print("-" * 50 + "\n")
 
 
+class ChatStream:
+    """
+    Reply tokens for one turn, yielded as they arrive from Ollama.
+    After iteration finishes, result holds what chat() would have returned,
+    with time-to-first-token and tokens/sec added to the timings.
+    """
+    
+    def __init__(self, bot: ScrambledOllamaBot, turn: Dict):
+        self.bot = bot
+        self.turn = turn
+        self.result: Optional[Dict] = None
+    
+    def __iter__(self) -> Iterator[str]:
+        tokens = []
+        first_token_at = None
+        final = {}
+        
+        try:
+            for chunk in self.bot.client.generate_stream(self.bot.model_name, self.turn['prompt'],
+                                                         **self.bot._generate_args(self.turn)):
+                token = chunk.get('response', '')
+                if not tokens:
+                    token = token.lstrip()  # Same text chat() returns after strip()
+                if token:
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    tokens.append(token)
+                    yield token
+                if chunk.get('done'):
+                    final = chunk
+            reply = ''.join(tokens).rstrip()
+        except (SchedulerBusy, OllamaError) as e:
+            if isinstance(e, SchedulerBusy):
+                reply = BUSY_REPLY
+            else:
+                reply = "Error generating response." if e.status else f"Error: {e}"
+            if not tokens:
+                yield reply
+        
+        self.result = self.bot._turn_result(self.turn, reply, final.get('context'))
+        timings = self.result['timings']
+        timings['ttft_ms'] = ((first_token_at - self.turn['scrambled_at']) * 1000
+                              if first_token_at is not None else None)
+        
+        # Ollama's own eval counters when present, otherwise our count over the streaming window
+        if final.get('eval_count') and final.get('eval_duration'):
+            timings['tokens_per_sec'] = final['eval_count'] / (final['eval_duration'] / 1e9)
+        elif first_token_at is not None and len(tokens) > 1:
+            stream_seconds = timings['generate_ms'] / 1000 - timings['ttft_ms'] / 1000
+            timings['tokens_per_sec'] = (len(tokens) - 1) / max(stream_seconds, 1e-6)
+        else:
+            timings['tokens_per_sec'] = None
+
+
 # ============= PART 3: MAIN PROGRAM =============
 
 def main():
@@ -396,13 +968,17 @@ def main():
     ║                                                    ║
     ║  Your words are scrambled before reaching the AI  ║
     ║  Type 'quit' to exit | 'security' for stats       ║
+    ║  'reset' starts a fresh conversation              ║
     ╚════════════════════════════════════════════════════╝
     """)
     
-    # Initialize bot
-    bot = ScrambledOllamaBot()
+    # Initialize bot (ALPHAWALL_LEXICON points at a compiled lexicon from compact_lexicon.py)
+    # OLLAMA_MODEL picks the model, ALPHAWALL_KEEP_ALIVE how long it stays loaded between turns
+    keep_alive = _parse_keep_alive(os.environ.get('ALPHAWALL_KEEP_ALIVE'))
+    bot = ScrambledOllamaBot(lexicon_path=os.environ.get('ALPHAWALL_LEXICON'), keep_alive=keep_alive)
     
     print("\n💬 Start chatting! Your privacy is protected.\n")
+    session_id = f"cli-{os.getpid()}"
     
     while True:
         try:
@@ -415,21 +991,31 @@ def main():
             elif user_input.lower() == 'security':
                 bot.show_security_info()
                 continue
+            elif user_input.lower() == 'reset':
+                bot.forget_session(session_id)
+                print("🧹 Conversation reset.\n")
+                continue
             elif not user_input:
                 continue
             
             # Show what happens
             print(f"\n🔀 Scrambling your input...", end='', flush=True)
             
-            # Get response
-            response = bot.chat(user_input)
-            
-            print(f"\r🤖 Bot: {response}\n")
+            # Stream the response as it is generated (scrambling info comes back with it)
+            stream = bot.chat_stream(user_input, session_id)
+            print("\r🤖 Bot: ", end='', flush=True)
+            for token in stream:
+                print(token, end='', flush=True)
+            print("\n")
+            result = stream.result
             
             # Show scrambling info
-            result = bot.alphawall.process_input(user_input)
+            timings = result['timings']
+            speed = f" | {timings['tokens_per_sec']:.0f} tok/s" if timings['tokens_per_sec'] else ""
+            first = f" | first token {timings['ttft_ms'] / 1000:.1f}s" if timings['ttft_ms'] is not None else ""
             print(f"[Scrambled: {result['metrics']['substitution_rate']:.0%} of words | "
-                  f"Privacy: Protected | Security: Active]")
+                  f"Privacy: Protected | Security: Active | "
+                  f"{timings['total_ms'] / 1000:.1f}s{first}{speed}]")
             print("-" * 60 + "\n")
             
         except KeyboardInterrupt:
@@ -443,8 +1029,8 @@ def main():
 if __name__ == "__main__":
     # Check if Ollama is running first
     try:
-        requests.get("http://localhost:11434/api/tags", timeout=1)
-    except:
+        default_client().tags(timeout=1)
+    except OllamaError:
         print("❌ Please start Ollama first!")
         print("1. Make sure Ollama is installed")
         print("2. Start it from your system tray")
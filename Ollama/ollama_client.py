@@ -0,0 +1,561 @@
+"""
+ollama_client.py - Pooled keep-alive HTTP client for Ollama
+
+One requests.Session per client keeps connections to the Ollama host open
+between turns instead of opening a new TCP connection for every call.
+The scrambler bot, the injection tester and anything else talking to
+Ollama share default_client() unless they are handed their own.
+
+Resilience, per host:
+- connect and read timeouts are separate, so a dead host fails in seconds
+- retries use jittered exponential backoff; calls that may already have
+  run on the server (POSTs that got through) are not retried
+- a circuit breaker fails fast while the host keeps failing
+- with hedge_urls and hedge_after, a slow call is raced against a copy
+  on the next host and the first answer wins
+get_stats() reports breaker state, retries and hedges per host.
+
+With several upstreams (or OLLAMA_HOSTS=host1,host2,...) calls go to the
+host with the fewest outstanding requests, preferring hosts that already
+have the model loaded. A conversation sticks to the host that served it.
+A background health check polls /api/ps and /api/tags, takes failing
+hosts out of rotation and puts them back once they answer again.
+"""
+
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout, as_completed
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+
+from circuit_breaker import CircuitBreaker
+from request_scheduler import PRIORITY_NORMAL, RequestScheduler
+from response_cache import ResponseCache
+
+
+DEFAULT_HOST = "http://localhost:11434"
+
+
+class OllamaError(Exception):
+    """Ollama could not be reached or answered with an error status"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class UpstreamUnavailable(OllamaError):
+    """The request never reached the host: its circuit is open or it refused the connection"""
+
+
+# The field a complete reply can't do without
+_REPLY_FIELDS = {'/api/generate': 'response', '/api/chat': 'message'}
+
+
+def _json(response: requests.Response, required: Optional[str] = None) -> Dict:
+    """The body as a JSON object; anything else is an OllamaError, like a failed call"""
+    try:
+        body = response.json()
+    except ValueError as e:
+        raise OllamaError(f"Ollama sent a reply that isn't JSON: {e}", response.status_code) from e
+    if not isinstance(body, dict):
+        raise OllamaError("Ollama sent an unexpected reply (not a JSON object)", response.status_code)
+    if required and required not in body:
+        raise OllamaError(f"Ollama sent an unexpected reply (no '{required}' field)", response.status_code)
+    return body
+
+
+def _normalize_host(host: str) -> str:
+    """'host', 'host:port' or a full URL, as the Ollama CLI reads OLLAMA_HOST"""
+    host = host.strip()
+    if '://' not in host:
+        if ':' not in host:
+            host += ":11434"
+        host = f"http://{host}"
+    return host.rstrip('/')
+
+
+def _host_from_env() -> str:
+    host = os.environ.get('OLLAMA_HOST', '').strip()
+    return _normalize_host(host) if host else DEFAULT_HOST
+
+
+def _hosts_from_env() -> List[str]:
+    """OLLAMA_HOSTS (comma-separated) when set, otherwise the single OLLAMA_HOST"""
+    hosts = [host for host in os.environ.get('OLLAMA_HOSTS', '').split(',') if host.strip()]
+    return [_normalize_host(host) for host in hosts] or [_host_from_env()]
+
+
+def _parse_keep_alive(value: Optional[str]):
+    """A keep_alive from the command line or environment: '10m' stays a string, '300' or '-1' become ints"""
+    if value and value.lstrip('-').isdigit():
+        return int(value)  # Ollama wants plain seconds as a number, not a string
+    return value
+
+
+def _never_sent(error: requests.RequestException) -> bool:
+    """True when the connection failed before the request went out"""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    reason = getattr(error.args[0], 'reason', None) if error.args else None
+    return isinstance(reason, NewConnectionError)
+
+
+class Upstream:
+    """One Ollama host: its circuit breaker, health and counters"""
+
+    def __init__(self, url: str, breaker: CircuitBreaker, backup: bool = False):
+        self.url = url
+        self.breaker = breaker
+        self.backup = backup  # Only used for hedging and failover, never balanced onto
+        self.in_flight = 0    # Outstanding calls, including those queued for a slot
+
+        # Kept up to date by the health check
+        self.ejected = False
+        self.health_failures = 0
+        self.models: Optional[set] = None  # Installed; None until first checked
+        self.resident: set = set()         # Loaded in memory right now
+
+        self.stats = {'requests': 0, 'errors': 0, 'retries': 0, 'hedges': 0, 'hedge_wins': 0,
+                      'ejections': 0, 'readmissions': 0}
+        self._lock = threading.Lock()
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            stats = {**self.stats, 'in_flight': self.in_flight, 'ejected': self.ejected,
+                     'resident': sorted(self.resident)}
+        return {**stats, 'breaker': self.breaker.snapshot()}
+
+
+class OllamaClient:
+    """
+    Thread-safe Ollama API client over a pooled keep-alive session.
+    With a scheduler, generations wait for a slot on this host by priority
+    and raise SchedulerBusy instead of piling up on the server.
+    With a cache, deterministic requests seen before skip generation.
+    With upstreams, calls are balanced across several Ollama hosts.
+    """
+
+    def __init__(self, base_url: Optional[str] = None, pool_size: int = 10,
+                 connect_timeout: float = 2.0, read_timeout: float = 30.0,
+                 retries: int = 2, backoff: float = 0.3, max_backoff: float = 4.0,
+                 scheduler: Optional[RequestScheduler] = None, cache: Optional[ResponseCache] = None,
+                 tags_ttl: float = 60, hedge_urls: Optional[List[str]] = None,
+                 hedge_after: Optional[float] = None, failure_threshold: int = 5,
+                 reset_timeout: float = 15.0, upstreams: Optional[List[str]] = None,
+                 cold_penalty: int = 2, health_interval: Optional[float] = None,
+                 eject_after: int = 2, max_affinities: int = 10000):
+        balanced = [_normalize_host(url) for url in upstreams or []] or [(base_url or _host_from_env()).rstrip('/')]
+        self.base_url = balanced[0]
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.scheduler = scheduler
+        self.cache = cache
+
+        # Installed models change rarely; one /api/tags per tags_ttl is enough
+        self.tags_ttl = tags_ttl
+        self._tags: Optional[List[Dict]] = None
+        self._tags_at = 0.0
+
+        # Balanced hosts first, then backups a slow or failing call may move to
+        self.upstreams = [Upstream(url, CircuitBreaker(failure_threshold, reset_timeout)) for url in balanced]
+        self.upstreams += [Upstream(url.rstrip('/'), CircuitBreaker(failure_threshold, reset_timeout), backup=True)
+                           for url in hedge_urls or []]
+        self.hedge_after = hedge_after
+        self._hedge_pool = None
+        if hedge_after is not None and len(self.upstreams) > 1:
+            self._hedge_pool = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="ollama-hedge")
+
+        # Retries happen in _send, where they are counted and jittered
+        adapter = HTTPAdapter(pool_connections=len(self.upstreams), pool_maxsize=pool_size,
+                              pool_block=True, max_retries=0)
+        self.session = requests.Session()
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        # A host without the model loaded counts as this many extra outstanding calls
+        self.cold_penalty = cold_penalty
+
+        # session_id -> host that served it, so its conversation context stays warm there
+        self._affinity: OrderedDict = OrderedDict()
+        self._affinity_lock = threading.Lock()
+        self.max_affinities = max_affinities
+
+        # Health checks only matter once there is more than one host to choose from
+        if health_interval is None and len(self.upstreams) > 1:
+            health_interval = 10.0
+        self.health_interval = health_interval
+        self.eject_after = eject_after
+        self._stop = threading.Event()
+        self._health_thread = None
+        if health_interval:
+            self._health_thread = threading.Thread(target=self._health_loop, name="ollama-health", daemon=True)
+            self._health_thread.start()
+
+    # ---------- health ----------
+
+    def _health_loop(self):
+        while not self._stop.is_set():
+            for upstream in self.upstreams:
+                try:
+                    self.check_health(upstream)
+                except Exception as e:
+                    # One bad check must not end health checking for every host
+                    print(f"⚠️ Health check of {upstream.url} failed: {e}")
+            self._stop.wait(self.health_interval)
+
+    def check_health(self, upstream: Upstream) -> bool:
+        """Poll /api/ps and /api/tags; eject after eject_after failures, readmit on success"""
+        timeout = (self.timeout[0], 5)
+        try:
+            running = self.session.get(f"{upstream.url}/api/ps", timeout=timeout)
+            installed = self.session.get(f"{upstream.url}/api/tags", timeout=timeout)
+            running.raise_for_status()
+            installed.raise_for_status()
+            # A 200 that isn't Ollama's JSON (a proxy error page, say) is not healthy either
+            resident = {m['name'] for m in running.json().get('models', [])}
+            models = {m['name'] for m in installed.json().get('models', [])}
+        except (requests.RequestException, ValueError, AttributeError, KeyError, TypeError):
+            upstream.health_failures += 1
+            if upstream.health_failures >= self.eject_after and not upstream.ejected:
+                upstream.ejected = True
+                upstream.count('ejections')
+            return False
+
+        upstream.resident = resident
+        upstream.models = models
+        upstream.health_failures = 0
+        if upstream.ejected:
+            upstream.ejected = False
+            upstream.count('readmissions')
+            upstream.breaker.record_success()  # It answers again; no need to wait out the breaker
+        return True
+
+    # ---------- one host ----------
+
+    def _send(self, upstream: Upstream, method: str, path: str, timeout=None, **kwargs) -> requests.Response:
+        """One call to one host: circuit check, then bounded retries with jittered backoff"""
+        idempotent = method == 'GET'
+        error = None
+        for attempt in range(self.retries + 1):
+            if attempt:
+                upstream.count('retries')
+                time.sleep(random.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt)))
+            if not upstream.breaker.allow():
+                raise UpstreamUnavailable(f"Ollama at {upstream.url} is failing; not sending (circuit open)")
+
+            upstream.count('requests')
+            try:
+                response = self.session.request(method, f"{upstream.url}{path}",
+                                                timeout=timeout or self.timeout, **kwargs)
+            except requests.RequestException as e:
+                upstream.count('errors')
+                upstream.breaker.record_failure()
+                error = e
+                if _never_sent(e) or (idempotent and isinstance(e, (requests.ConnectionError, requests.Timeout))):
+                    continue
+                raise OllamaError(f"Ollama request failed: {e}") from e
+
+            if response.status_code >= 500:
+                upstream.count('errors')
+                upstream.breaker.record_failure()
+                if idempotent and response.status_code in (502, 503, 504) and attempt < self.retries:
+                    response.close()
+                    continue
+            else:
+                upstream.breaker.record_success()
+            if response.status_code != 200:
+                raise OllamaError(f"Ollama returned {response.status_code}: {response.text[:200]}",
+                                  status=response.status_code)
+            return response
+
+        if _never_sent(error):
+            raise UpstreamUnavailable(f"Ollama at {upstream.url} is unreachable: {error}") from error
+        raise OllamaError(f"Ollama request failed: {error}") from error
+
+    @contextmanager
+    def _using(self, upstream: Upstream, priority: Optional[int]):
+        """Count the call as outstanding on upstream and hold a scheduler slot (generations only)"""
+        slot = self.scheduler.slot(upstream.url, priority) \
+            if self.scheduler is not None and priority is not None else nullcontext()
+        with upstream._lock:
+            upstream.in_flight += 1
+        try:
+            with slot:
+                yield
+        finally:
+            with upstream._lock:
+                upstream.in_flight -= 1
+
+    def _attempt(self, upstream: Upstream, method: str, path: str, timeout, priority,
+                 session_id: Optional[str] = None, **kwargs):
+        with self._using(upstream, priority):
+            response = self._send(upstream, method, path, timeout, **kwargs)
+        self._remember_affinity(session_id, upstream)
+        return response
+
+    # ---------- across hosts ----------
+
+    def _remember_affinity(self, session_id: Optional[str], upstream: Upstream):
+        if not session_id or upstream.backup:
+            return
+        with self._affinity_lock:
+            self._affinity[session_id] = upstream.url
+            self._affinity.move_to_end(session_id)
+            while len(self._affinity) > self.max_affinities:
+                self._affinity.popitem(last=False)
+
+    def _candidates(self, model: Optional[str] = None, session_id: Optional[str] = None) -> List[Upstream]:
+        """
+        Hosts worth trying, best first; raises when every circuit is open.
+        The session's own host leads, then the least loaded, counting a host
+        without the model loaded as cold_penalty calls busier. Backups go last.
+        """
+        closed = [u for u in self.upstreams if u.breaker.state != CircuitBreaker.OPEN]
+        # If health checks ejected everything, they may be stale; try the hosts anyway
+        live = [u for u in closed if not u.ejected] or closed
+        if not live:
+            raise UpstreamUnavailable("every Ollama host is failing; not sending (circuits open)")
+
+        balanced = [u for u in live if not u.backup]
+        backups = [u for u in live if u.backup]
+        if model:
+            balanced = [u for u in balanced if u.models is None or model in u.models] or balanced
+
+        random.shuffle(balanced)  # Ties go to a random host, not always the first
+        balanced.sort(key=lambda u: u.in_flight + (0 if model in u.resident else self.cold_penalty))
+
+        if session_id:
+            with self._affinity_lock:
+                url = self._affinity.get(session_id)
+            for index, upstream in enumerate(balanced):
+                if upstream.url == url:
+                    balanced.insert(0, balanced.pop(index))
+                    break
+        return balanced + backups
+
+    def _failover(self, hosts: List[Upstream], *args, **kwargs) -> requests.Response:
+        """First host that takes the request; moves on only when it never reached a host"""
+        error = None
+        for upstream in hosts:
+            try:
+                return self._attempt(upstream, *args, **kwargs)
+            except UpstreamUnavailable as e:
+                error = e
+        raise error
+
+    def _call(self, method: str, path: str, timeout=None, priority: Optional[int] = None,
+              model: Optional[str] = None, session_id: Optional[str] = None, **kwargs) -> requests.Response:
+        """A complete (non-streaming) call, hedged across hosts when configured"""
+        hosts = self._candidates(model, session_id)
+        kwargs['session_id'] = session_id
+        if self._hedge_pool is None or len(hosts) < 2:
+            return self._failover(hosts, method, path, timeout, priority, **kwargs)
+
+        primary, backups = hosts[0], hosts[1:]
+        first = self._hedge_pool.submit(self._attempt, primary, method, path, timeout, priority, **kwargs)
+        try:
+            return first.result(timeout=self.hedge_after)
+        except FutureTimeout:
+            pass
+        except UpstreamUnavailable:
+            return self._failover(backups, method, path, timeout, priority, **kwargs)
+
+        # The primary is slow: race a copy on the next host, first answer wins
+        backup = backups[0]
+        backup.count('hedges')
+        second = self._hedge_pool.submit(self._attempt, backup, method, path, timeout, priority, **kwargs)
+        errors = []
+        for future in as_completed([first, second]):
+            try:
+                response = future.result()
+            except OllamaError as e:
+                errors.append(e)
+                continue
+            if future is second:
+                backup.count('hedge_wins')
+            return response
+        raise errors[0]
+
+    # ---------- API ----------
+
+    def _cache_key(self, path: str, payload: Dict) -> Optional[str]:
+        if self.cache is None:
+            return None
+        if not self.cache.cacheable(payload):
+            self.cache.bypass()
+            return None
+        return self.cache.key_for(path, payload)
+
+    def _post(self, path: str, payload: Dict, timeout, priority: int, session_id: Optional[str] = None) -> Dict:
+        """Non-streaming POST, answered from the cache when possible"""
+        key = self._cache_key(path, payload)
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                return dict(cached)
+
+        response = _json(self._call('POST', path, timeout, priority, model=payload.get('model'),
+                                    session_id=session_id, json=payload), _REPLY_FIELDS.get(path))
+        if key and response.get('done', True):
+            self.cache.put(key, response)
+        return response
+
+    def tags(self, timeout=None, refresh: bool = False) -> List[Dict]:
+        """Installed models, as listed by /api/tags (cached for tags_ttl seconds)"""
+        now = time.monotonic()
+        if refresh or self._tags is None or now - self._tags_at >= self.tags_ttl:
+            self._tags = _json(self._call('GET', '/api/tags', timeout)).get('models', [])
+            self._tags_at = now
+        return self._tags
+
+    def running(self, timeout=None) -> List[Dict]:
+        """Models currently loaded in memory, as listed by /api/ps"""
+        return _json(self._call('GET', '/api/ps', timeout)).get('models', [])
+
+    def warm(self, model: str, keep_alive=None, timeout=None) -> Dict[str, Dict]:
+        """
+        Load model on every live balanced host without generating anything (an empty /api/generate).
+        keep_alive sets how long it stays resident: '10m', seconds, -1 forever, 0 unload now.
+        Returns host URL -> response for the hosts that answered.
+        """
+        payload = {'model': model}
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+        results = {}
+        error = None
+        for upstream in self._candidates(model):
+            if upstream.backup:
+                continue
+            try:
+                results[upstream.url] = _json(self._attempt(upstream, 'POST', '/api/generate', timeout, None,
+                                                            json=payload))
+                upstream.resident.add(model)
+            except OllamaError as e:
+                error = e
+        if not results and error is not None:
+            raise error
+        return results
+
+    def generate(self, model: str, prompt: str, options: Optional[Dict] = None,
+                 timeout=None, priority: int = PRIORITY_NORMAL, session_id: Optional[str] = None,
+                 **extra) -> Dict:
+        """Non-streaming /api/generate; returns the full response object"""
+        payload = {'model': model, 'prompt': prompt, 'stream': False, **extra}
+        if options:
+            payload['options'] = options
+        return self._post('/api/generate', payload, timeout, priority, session_id)
+
+    def generate_stream(self, model: str, prompt: str, options: Optional[Dict] = None,
+                        timeout=None, priority: int = PRIORITY_NORMAL, session_id: Optional[str] = None,
+                        **extra) -> Iterator[Dict]:
+        """
+        Streaming /api/generate. Yields each NDJSON chunk as Ollama sends it;
+        the last one has done=True and carries the eval counters.
+        A cached reply arrives as a single done=True chunk.
+        Streams are not hedged, but move to the next host if the first can't be reached.
+        """
+        payload = {'model': model, 'prompt': prompt, 'stream': True, **extra}
+        if options:
+            payload['options'] = options
+
+        key = self._cache_key('/api/generate', payload)
+        if key:
+            cached = self.cache.get(key)
+            if cached is not None:
+                yield dict(cached)
+                return
+
+        hosts = self._candidates(model, session_id)
+        for index, upstream in enumerate(hosts):
+            # The slot is held until the stream is finished or closed
+            with self._using(upstream, priority):
+                try:
+                    response = self._send(upstream, 'POST', '/api/generate', timeout, json=payload, stream=True)
+                except UpstreamUnavailable:
+                    if index == len(hosts) - 1:
+                        raise
+                    continue
+                self._remember_affinity(session_id, upstream)
+                with response:
+                    yield from self._read_stream(upstream, response, key)
+                return
+
+    def _read_stream(self, upstream: Upstream, response: requests.Response, key: Optional[str]) -> Iterator[Dict]:
+        pieces = []
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                chunk = json.loads(line)
+                if not isinstance(chunk, dict):
+                    raise ValueError(f"expected a JSON object, got {line[:80]!r}")
+                if 'error' in chunk:
+                    raise OllamaError(f"Ollama error: {chunk['error']}")
+                if key:
+                    pieces.append(chunk.get('response', ''))
+                    if chunk.get('done'):
+                        self.cache.put(key, {**chunk, 'response': ''.join(pieces)})
+                yield chunk
+        except (requests.RequestException, ValueError) as e:
+            upstream.count('errors')
+            upstream.breaker.record_failure()
+            raise OllamaError(f"Ollama stream broke off: {e}") from e
+
+    def chat(self, model: str, messages: List[Dict], options: Optional[Dict] = None,
+             timeout=None, priority: int = PRIORITY_NORMAL, session_id: Optional[str] = None,
+             **extra) -> Dict:
+        """Non-streaming /api/chat; returns the full response object"""
+        payload = {'model': model, 'messages': messages, 'stream': False, **extra}
+        if options:
+            payload['options'] = options
+        return self._post('/api/chat', payload, timeout, priority, session_id)
+
+    def get_stats(self) -> Dict:
+        """Per-host load, health, breaker state, retries and hedges"""
+        with self._affinity_lock:
+            sessions = len(self._affinity)
+        return {'upstreams': {u.url: u.snapshot() for u in self.upstreams}, 'sticky_sessions': sessions}
+
+    def close(self):
+        self._stop.set()
+        if self._hedge_pool is not None:
+            self._hedge_pool.shutdown(wait=False)
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default_client: Optional[OllamaClient] = None
+_default_lock = threading.Lock()
+
+
+def default_client() -> OllamaClient:
+    """Process-wide client shared by everything that doesn't bring its own"""
+    global _default_client
+    with _default_lock:
+        if _default_client is None:
+            # Match the generations the server runs at once (OLLAMA_NUM_PARALLEL on the Ollama side)
+            parallel = int(os.environ.get('OLLAMA_NUM_PARALLEL', '4'))
+            _default_client = OllamaClient(upstreams=_hosts_from_env(),
+                                           scheduler=RequestScheduler(max_concurrent=parallel),
+                                           cache=ResponseCache())
+        return _default_client
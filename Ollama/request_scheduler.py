@@ -0,0 +1,208 @@
+"""
+request_scheduler.py - Priority scheduling and load shedding for Ollama calls
+
+An Ollama host only runs a few generations at once; the rest queue inside
+it until they time out. The scheduler keeps that queue on our side instead,
+so we decide the order and can give up early:
+
+- at most max_concurrent calls in flight per upstream
+- waiting calls are served by priority class (urgent, then questions, then
+  the rest), first come first served within a class
+- a call waits at most queue_timeout seconds, and when max_queued calls are
+  already waiting it is refused at once; both raise SchedulerBusy so the
+  caller can answer "busy" straight away instead of timing out after 30 s
+
+RequestScheduler is for threads, AsyncRequestScheduler for asyncio.
+"""
+
+import asyncio
+import heapq
+import itertools
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Dict, List, Optional
+
+
+PRIORITY_URGENT = 0
+PRIORITY_QUESTION = 1
+PRIORITY_NORMAL = 2
+
+
+def priority_for(features: Optional[Dict]) -> int:
+    """Priority class from the features WordScramblerAlphaWall.process_input reports"""
+    if not features:
+        return PRIORITY_NORMAL
+    if features.get('is_urgent'):
+        return PRIORITY_URGENT
+    if features.get('has_question'):
+        return PRIORITY_QUESTION
+    return PRIORITY_NORMAL
+
+
+class SchedulerBusy(Exception):
+    """No slot became free in time; the call was not sent"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Lane:
+    """Bookkeeping for one upstream: calls in flight and a priority heap of waiters"""
+
+    def __init__(self):
+        self.active = 0
+        self.heap: List = []  # (priority, seq, waiter)
+        self.waiting = 0      # live waiters; cancelled ones stay in the heap until popped
+
+    def pop_live(self):
+        while self.heap:
+            _, _, waiter = heapq.heappop(self.heap)
+            if not waiter.cancelled:
+                return waiter
+        return None
+
+
+class _Waiter:
+    __slots__ = ('cancelled', 'granted', 'event')
+
+    def __init__(self, event):
+        self.cancelled = False
+        self.granted = False
+        self.event = event
+
+
+class _SchedulerBase:
+    def __init__(self, max_concurrent: int = 4, max_queued: int = 64, queue_timeout: float = 10.0):
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self._lanes: Dict[str, _Lane] = {}
+        self._seq = itertools.count()
+        self.stats = {'granted': 0, 'queued': 0, 'shed_full': 0, 'shed_deadline': 0,
+                      'cancelled': 0, 'max_wait_ms': 0.0}
+
+    def _lane(self, upstream: str) -> _Lane:
+        lane = self._lanes.get(upstream)
+        if lane is None:
+            lane = self._lanes[upstream] = _Lane()
+        return lane
+
+    def _try_enter(self, lane: _Lane) -> bool:
+        if lane.active < self.max_concurrent and lane.waiting == 0:
+            lane.active += 1
+            self.stats['granted'] += 1
+            return True
+        if lane.waiting >= self.max_queued:
+            self.stats['shed_full'] += 1
+            raise SchedulerBusy("too many requests waiting for the model", retry_after=self.queue_timeout / 2)
+        return False
+
+    def _enqueue(self, lane: _Lane, priority: int, waiter: _Waiter):
+        heapq.heappush(lane.heap, (priority, next(self._seq), waiter))
+        lane.waiting += 1
+        self.stats['queued'] += 1
+
+    def _hand_off(self, lane: _Lane):
+        """A slot was released: give it to the best waiter, keeping the count in flight"""
+        waiter = lane.pop_live()
+        if waiter is None:
+            lane.active -= 1
+            return None
+        lane.waiting -= 1
+        waiter.granted = True
+        self.stats['granted'] += 1
+        return waiter
+
+    def _give_up(self, lane: _Lane, waiter: _Waiter, reason: str = 'shed_deadline') -> bool:
+        """Stop waiting. False if the slot was granted in the meantime."""
+        if waiter.granted:
+            return False
+        waiter.cancelled = True
+        lane.waiting -= 1
+        self.stats[reason] += 1
+        return True
+
+    def _record_wait(self, queued_at: float):
+        self.stats['max_wait_ms'] = max(self.stats['max_wait_ms'], (time.monotonic() - queued_at) * 1000)
+
+    def saturated(self, upstream: str = 'default') -> bool:
+        lane = self._lanes.get(upstream)
+        return lane is not None and lane.waiting >= self.max_queued
+
+    def get_stats(self) -> Dict:
+        lanes = {upstream: {'active': lane.active, 'waiting': lane.waiting}
+                 for upstream, lane in self._lanes.items()}
+        return {**self.stats, 'upstreams': lanes}
+
+
+class RequestScheduler(_SchedulerBase):
+    """Thread-safe scheduler: wrap each call in `with scheduler.slot(upstream, priority):`"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, upstream: str = 'default', priority: int = PRIORITY_NORMAL,
+             queue_timeout: Optional[float] = None):
+        with self._lock:
+            lane = self._lane(upstream)
+            entered = self._try_enter(lane)
+            if not entered:
+                waiter = _Waiter(threading.Event())
+                self._enqueue(lane, priority, waiter)
+        if not entered:
+            queued_at = time.monotonic()
+            timeout = self.queue_timeout if queue_timeout is None else queue_timeout
+            if not waiter.event.wait(timeout):
+                with self._lock:
+                    if self._give_up(lane, waiter):
+                        raise SchedulerBusy(f"no model slot free within {timeout:.0f}s",
+                                            retry_after=timeout / 2)
+            self._record_wait(queued_at)
+
+        try:
+            yield
+        finally:
+            with self._lock:
+                waiter = self._hand_off(lane)
+            if waiter is not None:
+                waiter.event.set()
+
+
+class AsyncRequestScheduler(_SchedulerBase):
+    """asyncio scheduler: `async with scheduler.slot(upstream, priority):`, used from one event loop"""
+
+    @asynccontextmanager
+    async def slot(self, upstream: str = 'default', priority: int = PRIORITY_NORMAL,
+                   queue_timeout: Optional[float] = None):
+        lane = self._lane(upstream)
+        if not self._try_enter(lane):
+            waiter = _Waiter(asyncio.get_running_loop().create_future())
+            self._enqueue(lane, priority, waiter)
+            queued_at = time.monotonic()
+            timeout = self.queue_timeout if queue_timeout is None else queue_timeout
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.event), timeout)
+            except asyncio.TimeoutError:
+                if self._give_up(lane, waiter):
+                    raise SchedulerBusy(f"no model slot free within {timeout:.0f}s",
+                                        retry_after=timeout / 2)
+            except asyncio.CancelledError:
+                # Client went away while queued; pass on a slot we may already hold
+                if not self._give_up(lane, waiter, 'cancelled'):
+                    self._release(lane)
+                raise
+            self._record_wait(queued_at)
+
+        try:
+            yield
+        finally:
+            self._release(lane)
+
+    def _release(self, lane: _Lane):
+        waiter = self._hand_off(lane)
+        if waiter is not None:
+            waiter.event.set_result(True)
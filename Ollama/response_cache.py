@@ -0,0 +1,130 @@
+"""
+response_cache.py - Completion cache for the Ollama client
+
+Greetings, FAQs and repeated injection probes often scramble to the same
+prompt. When the request is deterministic the reply will be the same too,
+so it is served from the cache instead of a multi-second generation.
+
+Entries are keyed by a hash of (model, options, prompt and other request
+fields). They live in an in-memory LRU with a TTL, and optionally in a
+SQLite file shared across restarts and processes. Only deterministic
+requests are cached: temperature 0 or a fixed seed, and no conversation
+context.
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional
+
+
+class ResponseCache:
+    """LRU + TTL cache of Ollama responses with an optional SQLite tier"""
+
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600, disk_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+
+        # key -> (stored at (wall clock, so disk entries age correctly), response); oldest first
+        self._entries: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+        self._conn = None
+        if disk_path:
+            Path(disk_path).parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(disk_path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                "key TEXT PRIMARY KEY, stored_at REAL NOT NULL, response TEXT NOT NULL)"
+            )
+
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'bypassed': 0, 'stored': 0}
+
+    @staticmethod
+    def cacheable(payload: Dict) -> bool:
+        """Only requests whose reply is reproducible"""
+        if payload.get('context') or payload.get('images'):
+            return False
+        options = payload.get('options') or {}
+        # Ollama's default temperature is non-zero, so it has to be set explicitly
+        return options.get('temperature') == 0 or 'seed' in options
+
+    @staticmethod
+    def key_for(path: str, payload: Dict) -> str:
+        """Hash of everything that shapes the reply; 'stream' only changes its framing"""
+        fields = {name: value for name, value in payload.items() if name not in ('stream', 'keep_alive')}
+        canonical = json.dumps([path, fields], sort_keys=True, separators=(',', ':'), ensure_ascii=False)
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def bypass(self):
+        with self._lock:
+            self.stats['bypassed'] += 1
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if now - entry[0] < self.ttl:
+                    self._entries.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return entry[1]
+                del self._entries[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    "SELECT stored_at, response FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row and now - row[0] < self.ttl:
+                    response = json.loads(row[1])
+                    self._remember(key, row[0], response)
+                    self.stats['disk_hits'] += 1
+                    return response
+
+            self.stats['misses'] += 1
+            return None
+
+    def put(self, key: str, response: Dict):
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, response)
+            self.stats['stored'] += 1
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO responses (key, stored_at, response) VALUES (?, ?, ?)",
+                        (key, now, json.dumps(response))
+                    )
+                    self._conn.execute("DELETE FROM responses WHERE stored_at < ?", (now - self.ttl,))
+
+    def _remember(self, key: str, stored_at: float, response: Dict):
+        self._entries[key] = (stored_at, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM responses")
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            hits = self.stats['memory_hits'] + self.stats['disk_hits']
+            lookups = hits + self.stats['misses']
+            return {
+                **self.stats,
+                'entries': len(self._entries),
+                'hit_rate': hits / lookups if lookups else 0.0
+            }
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
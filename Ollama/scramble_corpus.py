@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+scramble_corpus.py - Bulk-scramble a chat corpus on every CPU core
+Usage:
+    python scramble_corpus.py chats.jsonl scrambled.jsonl --field text
+    python scramble_corpus.py notes.txt scrambled.txt --format text --no-vault
+
+The input is streamed in batches to a process pool and written back in
+input order. Originals go to a bulk vault file (default: OUTPUT.vault.jsonl)
+unless --no-vault is given.
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Iterator, List, Optional, Tuple
+
+from ollama_alphawall_plugin import WordScramblerAlphaWall
+
+
+# ============= WORKER SIDE =============
+
+_wall: Optional[WordScramblerAlphaWall] = None
+_options: dict = {}
+
+
+def _init_worker(data_dir: str, lexicon_path: Optional[str], options: dict):
+    """Build one scrambler per worker process"""
+    global _wall, _options
+    random.seed()  # Forked workers must not share one random sequence
+    # Originals go to the bulk vault file written by the main process, never the scrambler's own
+    _wall = WordScramblerAlphaWall(data_dir=data_dir, lexicon_path=lexicon_path, use_vault=False)
+    _options = options
+
+
+def _scramble_batch(first_line: int, lines: List[bytes]) -> Tuple[bytes, bytes, int]:
+    """Scramble one batch. Returns (output, vault records, lines dropped)."""
+    output = []
+    vault = []
+    dropped = 0
+    keep_vault = _options['vault']
+    field = _options['field']
+    stamp = datetime.now().isoformat()
+
+    for offset, raw in enumerate(lines):
+        text = raw.decode('utf-8', errors='replace').rstrip('\r\n')
+        if not text.strip():
+            if _options['format'] == 'text':
+                output.append('')  # Keep text output line-for-line with the input
+            continue
+
+        if _options['format'] == 'jsonl':
+            try:
+                record = json.loads(text)
+                original = record[field]
+            except (ValueError, KeyError, TypeError):
+                # Never pass through a line we could not scramble
+                dropped += 1
+                continue
+            if not isinstance(original, str):
+                dropped += 1
+                continue
+            record[field], _ = _wall._scramble_text(original)
+            output.append(json.dumps(record, ensure_ascii=False))
+        else:
+            original = text
+            scrambled, _ = _wall._scramble_text(original)
+            output.append(scrambled)
+
+        if keep_vault:
+            line_number = first_line + offset
+            vault.append(json.dumps({
+                'id': hashlib.sha256(f"{line_number}:{original}".encode()).hexdigest()[:16],
+                'line': line_number,
+                'timestamp': stamp,
+                'text': original
+            }, ensure_ascii=False))
+
+    out_bytes = ('\n'.join(output) + '\n').encode('utf-8') if output else b''
+    vault_bytes = ('\n'.join(vault) + '\n').encode('utf-8') if vault else b''
+    return out_bytes, vault_bytes, dropped
+
+
+# ============= MAIN PROCESS =============
+
+def _read_batches(f, batch_bytes: int) -> Iterator[Tuple[int, List[bytes], int]]:
+    """Yield (first line number, lines, byte size) batches from a binary file"""
+    lines = []
+    size = 0
+    first_line = line_number = 1
+    for raw in f:
+        lines.append(raw)
+        size += len(raw)
+        line_number += 1
+        if size >= batch_bytes:
+            yield first_line, lines, size
+            first_line, lines, size = line_number, [], 0
+    if lines:
+        yield first_line, lines, size
+
+
+def _report(lines: int, read_bytes: int, total_bytes: int, dropped: int, started: float, final=False):
+    elapsed = max(time.time() - started, 1e-6)
+    percent = f" {read_bytes / total_bytes:.0%}" if total_bytes else ""
+    print(f"\r📦 {lines:,} lines{percent} | {read_bytes / 1e6:,.1f} MB | "
+          f"{lines / elapsed:,.0f} lines/s | {read_bytes / 1e6 / elapsed:,.1f} MB/s | "
+          f"dropped {dropped:,}", end='\n' if final else '', file=sys.stderr, flush=True)
+
+
+def scramble_corpus(input_path: str, output_path: str, fmt: str = 'jsonl', field: str = 'text',
+                    vault_path: Optional[str] = None, workers: Optional[int] = None,
+                    batch_bytes: int = 1024 * 1024, data_dir: str = "scrambler_data",
+                    lexicon_path: Optional[str] = None) -> dict:
+    """
+    Scramble input_path into output_path using a process pool.
+    vault_path=None skips storing the originals.
+    """
+    workers = workers or os.cpu_count() or 1
+    options = {'format': fmt, 'field': field, 'vault': vault_path is not None}
+    total_bytes = os.path.getsize(input_path) if os.path.isfile(input_path) else 0
+
+    lines = read_bytes = dropped = 0
+    started = last_report = time.time()
+    pending = deque()
+
+    with open(input_path, 'rb') as source, open(output_path, 'wb') as out, \
+            (open(vault_path, 'ab') if vault_path else open(os.devnull, 'wb')) as vault, \
+            ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                initargs=(data_dir, lexicon_path, options)) as pool:
+
+        def drain_one():
+            nonlocal lines, read_bytes, dropped, last_report
+            future, batch_lines, batch_size = pending.popleft()
+            out_bytes, vault_bytes, batch_dropped = future.result()
+            out.write(out_bytes)
+            if vault_bytes:
+                vault.write(vault_bytes)
+            lines += batch_lines
+            read_bytes += batch_size
+            dropped += batch_dropped
+            if time.time() - last_report >= 1:
+                _report(lines, read_bytes, total_bytes, dropped, started)
+                last_report = time.time()
+
+        for first_line, batch, size in _read_batches(source, batch_bytes):
+            pending.append((pool.submit(_scramble_batch, first_line, batch), len(batch), size))
+            # Bounded in-flight work keeps memory flat and output in order
+            if len(pending) >= workers * 4:
+                drain_one()
+        while pending:
+            drain_one()
+
+    _report(lines, read_bytes, total_bytes, dropped, started, final=True)
+    return {
+        'lines': lines,
+        'bytes': read_bytes,
+        'dropped': dropped,
+        'seconds': time.time() - started
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Scramble a JSONL or text corpus with the AlphaWall scrambler")
+    parser.add_argument('input', help="corpus to scramble")
+    parser.add_argument('output', help="where to write the scrambled corpus")
+    parser.add_argument('--format', choices=['jsonl', 'text'], default='jsonl',
+                        help="jsonl: one JSON object per line; text: one message per line")
+    parser.add_argument('--field', default='text', help="JSON field holding the message (jsonl only)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--batch-mb', type=float, default=1.0, help="input megabytes per batch")
+    parser.add_argument('--vault', default=None, help="vault file for originals (default: OUTPUT.vault.jsonl)")
+    parser.add_argument('--no-vault', action='store_true', help="do not store originals")
+    parser.add_argument('--lexicon', default=os.environ.get('ALPHAWALL_LEXICON'),
+                        help="compiled lexicon from compact_lexicon.py")
+    parser.add_argument('--data-dir', default="scrambler_data")
+    args = parser.parse_args()
+
+    vault_path = None if args.no_vault else (args.vault or f"{args.output}.vault.jsonl")
+
+    print(f"🔀 Scrambling {args.input} → {args.output} "
+          f"({args.workers or os.cpu_count()} workers, vault: {vault_path or 'off'})", file=sys.stderr)
+    stats = scramble_corpus(args.input, args.output, fmt=args.format, field=args.field,
+                            vault_path=vault_path, workers=args.workers,
+                            batch_bytes=int(args.batch_mb * 1024 * 1024),
+                            data_dir=args.data_dir, lexicon_path=args.lexicon)
+    print(f"✅ Done: {stats['lines']:,} lines in {stats['seconds']:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
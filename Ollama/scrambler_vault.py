@@ -0,0 +1,108 @@
+"""
+scrambler_vault.py - Append-only user vault for the AlphaWall scrambler
+
+The vault is a FeedbackJournal (rotating JSON lines, shared with the
+Core-Project feedback logs) whose appends are handed to a background
+thread, so the chat path never waits on disk.
+"""
+
+import atexit
+import os
+import queue
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+sys.path.append(str(Path(__file__).resolve().parent.parent / "Core-Project"))
+from feedback_journal import FeedbackJournal
+
+
+class AppendOnlyVault(FeedbackJournal):
+    """Rotating JSON-lines vault written asynchronously"""
+
+    _open_vaults: Dict[Tuple, 'AppendOnlyVault'] = {}
+    _open_lock = threading.Lock()
+
+    def __init__(self, path, max_bytes=1024 * 1024, backup_count=3,
+                 on_drop: Optional[Callable[[List[Dict]], None]] = None):
+        super().__init__(path, max_bytes=max_bytes, backup_count=backup_count, on_drop=on_drop)
+        self._queue = queue.Queue()
+        self._closed = False
+        self._writer = threading.Thread(target=self._write_loop, name=f"vault-{self.path.name}", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    @classmethod
+    def open(cls, path, max_bytes=1024 * 1024, backup_count=3,
+             on_drop: Optional[Callable[[List[Dict]], None]] = None) -> 'AppendOnlyVault':
+        """
+        One vault (and writer thread) per path and settings per process.
+        Openers with different settings get a vault of their own; that is safe
+        because every write is a single append and rotation takes a lock file.
+        """
+        key = (os.path.realpath(path), max_bytes, backup_count, on_drop)
+        with cls._open_lock:
+            vault = cls._open_vaults.get(key)
+            if vault is None or vault._closed:
+                vault = cls._open_vaults[key] = cls(path, max_bytes, backup_count, on_drop)
+            return vault
+
+    # ---------- writing ----------
+
+    def append(self, record: Dict):
+        """Queue a record for writing; returns immediately"""
+        if self._closed:
+            raise RuntimeError("vault is closed")
+        self._queue.put(record)
+
+    def flush(self):
+        """Wait until every queued record is on disk"""
+        self._queue.join()
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join()
+
+    def _write_loop(self):
+        while True:
+            record = self._queue.get()
+            batch = [record]
+            # Write whatever else is already waiting in the same call
+            while len(batch) < 512:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = [r for r in batch if r is not None]
+            try:
+                self.extend(records)
+            except OSError as e:
+                print(f"❌ Vault write failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if len(records) != len(batch):
+                return
+
+    # ---------- reading: wait for queued records first ----------
+
+    def __iter__(self) -> Iterator[Dict]:
+        """Every retained record, oldest first"""
+        self.flush()
+        return super().__iter__()
+
+    def recent(self, n: int) -> List[Dict]:
+        """Last n records, oldest first"""
+        self.flush()
+        return self.tail(n)
+
+    def import_legacy(self, legacy_file: Path):
+        """One-time import of the old whole-file JSON vault"""
+        self.flush()
+        super().import_legacy(legacy_file)
@@ -0,0 +1,98 @@
+"""
+session_context.py - Per-session Ollama conversation context
+
+/api/generate returns a 'context' array: the model's token state after
+the reply. Sending it back with the next prompt lets the model continue
+the conversation, paying prefill only for the new tokens rather than a
+resent transcript. The store bounds memory by the total number of tokens
+held across sessions. It evicts the least recently used sessions first
+and drops sessions that have been idle longer than idle_ttl.
+"""
+
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+
+class SessionContextStore:
+    """Thread-safe session_id -> Ollama context, bounded by total tokens"""
+
+    def __init__(self, max_total_tokens: int = 500_000, max_session_tokens: int = 4096,
+                 idle_ttl: float = 1800):
+        self.max_total_tokens = max_total_tokens
+        # Past the model's window the context can't be reused as-is, so the session starts over
+        self.max_session_tokens = max_session_tokens
+        self.idle_ttl = idle_ttl
+
+        # session_id -> (tokens as uint32, last used); oldest first
+        self._sessions: OrderedDict = OrderedDict()
+        self._total_tokens = 0
+        self._lock = threading.Lock()
+
+        self.stats = {'hits': 0, 'misses': 0, 'evicted': 0, 'expired': 0, 'overflowed': 0}
+
+    def _drop(self, session_id: str):
+        tokens, _ = self._sessions.pop(session_id)
+        self._total_tokens -= len(tokens)
+
+    def _expire(self, now: float):
+        # Oldest first, so stop at the first one still in use
+        while self._sessions:
+            session_id, (_, last_used) = next(iter(self._sessions.items()))
+            if now - last_used < self.idle_ttl:
+                break
+            self._drop(session_id)
+            self.stats['expired'] += 1
+
+    def get(self, session_id: str) -> Optional[List[int]]:
+        """Context to send with the session's next prompt, or None to start fresh"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                self.stats['misses'] += 1
+                return None
+            self._sessions[session_id] = (entry[0], now)
+            self._sessions.move_to_end(session_id)
+            self.stats['hits'] += 1
+            return entry[0].tolist()
+
+    def put(self, session_id: str, context: Optional[List[int]]):
+        """Store the context Ollama returned after the session's latest reply"""
+        now = time.monotonic()
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+            if not context:
+                return
+            if len(context) > self.max_session_tokens:
+                self.stats['overflowed'] += 1
+                return
+
+            tokens = array('I', context)
+            self._sessions[session_id] = (tokens, now)
+            self._total_tokens += len(tokens)
+
+            self._expire(now)
+            while self._total_tokens > self.max_total_tokens and len(self._sessions) > 1:
+                self._drop(next(iter(self._sessions)))
+                self.stats['evicted'] += 1
+
+    def forget(self, session_id: str):
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    @property
+    def total_tokens(self) -> int:
+        return self._total_tokens
+
+    def get_stats(self) -> Dict:
+        with self._lock:
+            return {**self.stats, 'sessions': len(self._sessions), 'total_tokens': self._total_tokens}
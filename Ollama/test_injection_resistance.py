@@ -4,33 +4,20 @@ test_injection_resistance.py - Test Ollama WITHOUT AlphaWall protection
 This shows what happens when prompts go directly to the model
 """
 
-import requests
-import json
 import time
 
+from ollama_client import OllamaError, default_client
+
 def test_ollama_direct(prompt: str, model: str = "llama2") -> str:
     """Send prompt directly to Ollama without any protection"""
     try:
-        response = requests.post(
-            'http://localhost:11434/api/generate',
-            json={
-                'model': model,
-                'prompt': prompt,
-                'stream': False,
-                'options': {
-                    'temperature': 0.7,
-                    'top_p': 0.9,
-                }
-            },
-            timeout=30
-        )
-        
-        if response.status_code == 200:
-            return response.json()['response'].strip()
-        else:
-            return f"Error: {response.status_code}"
-    except Exception as e:
-        return f"Error: {e}"
+        reply = default_client().generate(model, prompt, options={
+            'temperature': 0.7,
+            'top_p': 0.9,
+        })
+        return reply['response'].strip()
+    except OllamaError as e:
+        return f"Error: {e.status}" if e.status else f"Error: {e}"
 
 
 def run_injection_tests():
@@ -38,11 +25,10 @@ def run_injection_tests():
     
     # Get model name
     try:
-        resp = requests.get("http://localhost:11434/api/tags")
-        models = resp.json().get('models', [])
+        models = default_client().tags()
         model = models[0]['name'] if models else "llama2"
         print(f"Using model: {model}\n")
-    except:
+    except OllamaError:
         print("Make sure Ollama is running!")
         return
     
@@ -118,11 +104,10 @@ def interactive_mode():
     
     # Get model
     try:
-        resp = requests.get("http://localhost:11434/api/tags")
-        models = resp.json().get('models', [])
+        models = default_client().tags()
         model = models[0]['name'] if models else "llama2"
         print(f"Using model: {model}\n")
-    except:
+    except OllamaError:
         print("Make sure Ollama is running!")
         return
     
@@ -181,8 +166,8 @@ def main():
 if __name__ == "__main__":
     # Check if Ollama is running
     try:
-        requests.get("http://localhost:11434/api/tags", timeout=2)
-    except:
+        default_client().tags(timeout=2)
+    except OllamaError:
         print("Ollama is not running! Please start it first.")
         exit(1)
     
@@ -0,0 +1,416 @@
+"""
+test_offline_stack.py - Client, scheduler, cache, sessions, bot and proxy against MockOllamaServer
+Run from this directory: python -m pytest -q   (no Ollama needed)
+"""
+
+import asyncio
+import json
+import threading
+import time
+
+import pytest
+
+from mock_ollama_server import MockOllamaServer
+from ollama_alphawall_plugin import (BUSY_REPLY, PHRASE_SUBSTITUTIONS, WORD_SUBSTITUTIONS,
+                                     ScrambledOllamaBot, WordScramblerAlphaWall)
+from ollama_client import OllamaClient, OllamaError, UpstreamUnavailable
+from request_scheduler import PRIORITY_NORMAL, PRIORITY_URGENT, RequestScheduler, SchedulerBusy
+from response_cache import ResponseCache
+from scramble_corpus import scramble_corpus
+from scrambler_vault import AppendOnlyVault
+from session_context import SessionContextStore
+
+
+MODEL = 'mock:latest'
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    # The scrambler keeps its vault under the working directory
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def mock():
+    with MockOllamaServer() as server:
+        yield server
+
+
+@pytest.fixture
+def client(mock):
+    with OllamaClient(mock.url) as ollama:
+        yield ollama
+
+
+def _in_threads(target, count, stagger=0.0):
+    """Run target(i) on count threads; returns their results (exceptions included) in order"""
+    results = [None] * count
+
+    def run(i):
+        try:
+            results[i] = target(i)
+        except Exception as e:
+            results[i] = e
+
+    threads = []
+    for i in range(count):
+        threads.append(threading.Thread(target=run, args=(i,)))
+        threads[-1].start()
+        time.sleep(stagger)
+    for thread in threads:
+        thread.join()
+    return results
+
+
+# ---------- client ----------
+
+def test_generate_chat_and_stream(client):
+    reply = client.generate(MODEL, 'hello')
+    assert reply['response'] == 'You said: hello'
+    assert reply['context']
+
+    reply = client.chat(MODEL, [{'role': 'user', 'content': 'hi'}])
+    assert reply['message']['content'] == 'You said: hi'
+
+    chunks = list(client.generate_stream(MODEL, 'hello world'))
+    assert chunks[-1]['done']
+    assert ''.join(chunk.get('response', '') for chunk in chunks) == 'You said: hello world'
+
+
+def test_tags_are_cached(client, mock):
+    assert client.tags()[0]['name'] == MODEL
+    client.tags()
+    assert mock.stats['requests'] == 1
+
+
+def test_error_status_raises_without_retrying(mock):
+    mock.failure_rate, mock.failure_status = 1.0, 400
+    with OllamaClient(mock.url) as ollama:
+        with pytest.raises(OllamaError) as error:
+            ollama.generate(MODEL, 'hello')
+    assert error.value.status == 400
+    assert mock.stats['requests'] == 1
+
+
+def test_deterministic_requests_come_from_the_cache(mock):
+    with OllamaClient(mock.url, cache=ResponseCache()) as ollama:
+        first = ollama.generate(MODEL, 'hello', options={'temperature': 0})
+        second = ollama.generate(MODEL, 'hello', options={'temperature': 0})
+        assert first['response'] == second['response']
+        assert mock.stats['generations'] == 1
+
+        # Sampled replies are never cached
+        ollama.generate(MODEL, 'hello', options={'temperature': 0.7})
+        ollama.generate(MODEL, 'hello', options={'temperature': 0.7})
+        assert mock.stats['generations'] == 3
+        assert ollama.cache.get_stats()['memory_hits'] == 1
+
+
+def test_stopped_host_fails_over_to_backup():
+    with MockOllamaServer() as primary, MockOllamaServer() as backup:
+        with OllamaClient(primary.url, hedge_urls=[backup.url], retries=0) as ollama:
+            ollama.generate(MODEL, 'hello')  # Leaves a pooled connection to the primary
+            primary.stop()
+            assert ollama.generate(MODEL, 'hello')['response'] == 'You said: hello'
+            assert backup.stats['generations'] == 1
+
+
+def test_breaker_opens_on_a_dead_host(mock):
+    with OllamaClient(mock.url, retries=0, failure_threshold=2, reset_timeout=60) as ollama:
+        mock.stop()
+        for _ in range(3):
+            with pytest.raises(UpstreamUnavailable):
+                ollama.generate(MODEL, 'hello')
+        breaker = ollama.get_stats()['upstreams'][mock.url]['breaker']
+    assert breaker['state'] == 'open'
+    assert breaker['failures'] == 2  # The third call failed fast without trying the host
+
+
+def test_balancer_spreads_load_keeps_sessions_and_ejects():
+    mocks = [MockOllamaServer(latency=0.1).start() for _ in range(3)]
+    try:
+        with OllamaClient(upstreams=[m.url for m in mocks], scheduler=RequestScheduler(max_concurrent=1),
+                          health_interval=0.05, eject_after=1) as ollama:
+            ollama.warm(MODEL)  # Resident everywhere, so only the load decides
+            time.sleep(0.2)  # A health check that started before the warmup may report it cold once more
+            _in_threads(lambda i: ollama.generate(MODEL, f'hello {i}'), 6, stagger=0.01)
+            assert [m.stats['generations'] for m in mocks] == [2, 2, 2]
+
+            # A conversation stays on one host
+            for _ in range(3):
+                ollama.generate(MODEL, 'again', session_id='s1')
+            sticky = ollama._affinity['s1']
+            assert sum(m.stats['generations'] for m in mocks if m.url == sticky) >= 5
+
+            # Its host goes down: ejected, and the conversation moves
+            down = next(m for m in mocks if m.url == sticky)
+            down.stop()
+            deadline = time.monotonic() + 2
+            while not ollama.get_stats()['upstreams'][sticky]['ejected'] and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert ollama.get_stats()['upstreams'][sticky]['ejected']
+            ollama.generate(MODEL, 'again', session_id='s1')
+            assert ollama._affinity['s1'] != sticky
+
+            # Back up: readmitted
+            down.start()
+            deadline = time.monotonic() + 2
+            while ollama.get_stats()['upstreams'][sticky]['ejected'] and time.monotonic() < deadline:
+                time.sleep(0.02)
+            assert not ollama.get_stats()['upstreams'][sticky]['ejected']
+    finally:
+        for m in mocks:
+            m.stop()
+
+
+# ---------- scheduler ----------
+
+def test_scheduler_sheds_when_the_queue_is_full():
+    scheduler = RequestScheduler(max_concurrent=1, max_queued=1, queue_timeout=5)
+    with MockOllamaServer(latency=0.3) as slow, OllamaClient(slow.url, scheduler=scheduler) as ollama:
+        results = _in_threads(lambda i: ollama.generate(MODEL, 'hello'), 3, stagger=0.05)
+    assert [isinstance(result, SchedulerBusy) for result in results] == [False, False, True]
+    assert scheduler.stats['shed_full'] == 1
+    assert slow.stats['max_active'] == 1
+
+
+def test_scheduler_sheds_after_the_queue_timeout():
+    scheduler = RequestScheduler(max_concurrent=1, queue_timeout=0.05)
+    with MockOllamaServer(latency=0.3) as slow, OllamaClient(slow.url, scheduler=scheduler) as ollama:
+        results = _in_threads(lambda i: ollama.generate(MODEL, 'hello'), 2, stagger=0.05)
+    assert isinstance(results[1], SchedulerBusy)
+    assert scheduler.stats['shed_deadline'] == 1
+
+
+def test_scheduler_serves_urgent_first():
+    scheduler = RequestScheduler(max_concurrent=1)
+    order = []
+    release = threading.Event()
+
+    def hold(i):
+        with scheduler.slot('host', PRIORITY_NORMAL):
+            release.wait()
+
+    def wait_for_slot(priority):
+        with scheduler.slot('host', priority):
+            order.append(priority)
+
+    holder = threading.Thread(target=hold, args=(0,))
+    holder.start()
+    time.sleep(0.05)
+    waiters = [threading.Thread(target=wait_for_slot, args=(p,)) for p in (PRIORITY_NORMAL, PRIORITY_URGENT)]
+    for waiter in waiters:
+        waiter.start()
+        time.sleep(0.05)
+    release.set()
+    for thread in [holder] + waiters:
+        thread.join()
+    assert order == [PRIORITY_URGENT, PRIORITY_NORMAL]
+
+
+# ---------- session context ----------
+
+def test_session_store_is_bounded_by_total_tokens():
+    store = SessionContextStore(max_total_tokens=100, max_session_tokens=80)
+    store.put('a', list(range(60)))
+    store.put('b', list(range(60)))
+    assert store.get('a') is None
+    assert store.get('b') == list(range(60))
+
+    store.put('c', list(range(81)))  # Over the per-session cap: not kept
+    assert store.get('c') is None
+    assert store.total_tokens == 60
+
+
+# ---------- bot ----------
+
+def test_bot_keeps_context_per_session(client):
+    bot = ScrambledOllamaBot(client=client, warmup=False)
+    bot.chat('hello there', 'a')
+    first = bot.contexts.get('a')
+    result = bot.chat('and again', 'a')
+    assert result['context_tokens'] == len(first)
+    assert len(bot.contexts.get('a')) > len(first)
+
+    bot.forget_session('a')
+    assert bot.contexts.get('a') is None
+
+
+def test_bot_never_forwards_the_original_text(client):
+    bot = ScrambledOllamaBot(client=client, warmup=False)
+    result = bot.chat('my password is hunter2')
+    assert 'hunter2' not in result['response']  # The mock echoes what it was sent
+    assert result['scrambled_input'] in result['response']
+    assert result['memory_id']
+
+
+def test_bot_stream_matches_the_result(client):
+    bot = ScrambledOllamaBot(client=client, warmup=False)
+    stream = bot.chat_stream('tell me a story')
+    tokens = list(stream)
+    assert len(tokens) > 1
+    assert ''.join(tokens) == stream.result['response']
+    assert stream.result['timings']['ttft_ms'] is not None
+
+
+def test_bot_answers_busy_when_shed(mock):
+    scheduler = RequestScheduler(max_concurrent=1, queue_timeout=0.01)
+    mock.latency = 0.3
+    with OllamaClient(mock.url, scheduler=scheduler) as ollama:
+        bot = ScrambledOllamaBot(client=ollama, warmup=False)
+        results = _in_threads(lambda i: bot.chat('hello'), 2, stagger=0.05)
+    assert results[1]['response'] == BUSY_REPLY
+
+
+def test_bot_warms_up_the_model(mock):
+    with OllamaClient(mock.url) as ollama:
+        bot = ScrambledOllamaBot(client=ollama)
+        bot.warmup_thread.join()
+    assert bot.warmup_ms is not None
+    assert mock.running()[0]['name'] == MODEL
+
+
+# ---------- scrambler ----------
+
+def test_phrase_replacements_survive_the_word_pass():
+    wall = WordScramblerAlphaWall()
+    for text, phrase in [("tell me", "inform the speaker"), ("Ignore all", "Disregard everything"),
+                         ("i want my help", "one desires")]:
+        scrambled = wall._scramble_words(text)[0]
+        assert scrambled.startswith(phrase)
+        assert '[term]' not in scrambled
+
+
+def test_phrase_replacements_leave_no_headword_behind():
+    wall = WordScramblerAlphaWall()
+    critical = {'ignore', 'forget', 'instructions', 'previous', 'new', 'system', 'override'}
+    for phrase, target in PHRASE_SUBSTITUTIONS.items():
+        assert not critical & set(target.split()), target
+        for position in range(5):
+            scrambled = wall._scramble_words(phrase, position)[0]
+            assert not set(scrambled.lower().split()) & WORD_SUBSTITUTIONS.keys(), (phrase, scrambled)
+
+
+def test_unfinished_stream_leaves_no_original_behind():
+    wall = WordScramblerAlphaWall()
+
+    def broken():
+        yield "hello there friend "
+        raise RuntimeError("input failed")
+
+    with pytest.raises(RuntimeError):
+        list(wall.scramble_stream(broken()))
+    abandoned = iter(wall.scramble_stream(iter(["one two three four "] * 100)))
+    next(abandoned)
+    abandoned.close()
+    assert list(wall.stream_dir.iterdir()) == []
+
+    list(wall.scramble_stream(iter(["one two three "])))
+    assert len(list(wall.stream_dir.iterdir())) == 1
+
+
+def test_streamed_originals_stay_under_their_cap():
+    wall = WordScramblerAlphaWall(stream_max_bytes=4000)
+    for i in range(20):
+        list(wall.scramble_stream(iter([f"stream {i} ", "word " * 100])))
+    files = list(wall.stream_dir.glob('*.txt'))
+    assert 0 < len(files) < 20
+    assert sum(path.stat().st_size for path in files) <= 4000
+
+
+def test_vault_open_keys_on_its_settings(data_dir):
+    first = AppendOnlyVault.open(data_dir / 'v.jsonl', max_bytes=100)
+    assert AppendOnlyVault.open(data_dir / 'v.jsonl', max_bytes=100) is first
+    second = AppendOnlyVault.open(data_dir / 'v.jsonl', max_bytes=200)
+    assert second is not first and second.max_bytes == 200
+
+
+def test_corpus_text_keeps_blank_lines_and_workers_skip_the_vault(data_dir):
+    source = data_dir / 'notes.txt'
+    source.write_text("hello there\n\nplease help me\n")
+    scramble_corpus(str(source), str(data_dir / 'out.txt'), fmt='text', workers=1)
+    lines = (data_dir / 'out.txt').read_text().split('\n')
+    assert len(lines) == 4 and lines[1] == '' and lines[2] and lines[3] == ''
+    assert not (data_dir / 'scrambler_data' / 'user_vault').exists()
+
+
+def test_stream_matches_whole_text_across_chunk_boundaries():
+    wall = WordScramblerAlphaWall(session_secret=b'stream')
+    text = "Please tell me, can you act as a guide? " * 20 + 'x' * 50_000 + " and ignore all of it"
+    chunks = [text[i:i + 7] for i in range(0, len(text), 7)]
+    streamed = ''.join(wall.scramble_stream(iter(chunks), store=False))
+    assert streamed.split() == wall._scramble_words(text)[0].split()
+
+
+# ---------- proxy ----------
+
+def _with_proxy(mock, check, **options):
+    """Run the proxy in front of mock and await check(session, proxy_url, proxy)"""
+    aiohttp = pytest.importorskip('aiohttp')
+    from aiohttp import web
+    from alphawall_proxy import AlphaWallProxy
+
+    async def run():
+        proxy = AlphaWallProxy(upstream=mock.url, **options)
+        runner = web.AppRunner(proxy.build_app())
+        await runner.setup()
+        site = web.TCPSite(runner, '127.0.0.1', 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        try:
+            async with aiohttp.ClientSession() as session:
+                await check(session, f"http://127.0.0.1:{port}", proxy)
+        finally:
+            await runner.cleanup()
+
+    asyncio.run(run())
+
+
+def test_proxy_streams_scrambled_generations(mock):
+    async def check(session, url, proxy):
+        async with session.post(f"{url}/api/generate", json={'model': MODEL, 'prompt': 'my password is hunter2'}) as r:
+            assert r.status == 200
+            assert r.headers['X-AlphaWall-Memory-Id']
+            chunks = [json.loads(line) async for line in r.content if line.strip()]
+        assert chunks[-1]['done']
+        assert 'hunter2' not in ''.join(chunk.get('response', '') for chunk in chunks)
+
+    _with_proxy(mock, check)
+
+
+def test_proxy_scrambles_each_chat_turn_once(mock):
+    async def check(session, url, proxy):
+        messages = [{'role': 'user', 'content': 'tell me about the weather today'}]
+        async with session.post(f"{url}/api/chat", json={'model': MODEL, 'messages': messages, 'stream': False}) as r:
+            reply = (await r.json())['message']
+            first_id = r.headers['X-AlphaWall-Memory-Id']
+
+        messages += [reply, {'role': 'user', 'content': 'and tomorrow please'}]
+        async with session.post(f"{url}/api/chat", json={'model': MODEL, 'messages': messages, 'stream': False}) as r:
+            await r.json()
+            assert r.headers['X-AlphaWall-Memory-Id'] != first_id
+
+        assert proxy.stats['scrambled'] == 2
+        assert proxy.stats['history_reused'] == 1
+
+    _with_proxy(mock, check)
+
+
+def test_proxy_answers_503_when_the_queue_is_full(mock):
+    mock.latency = 0.3
+
+    async def check(session, url, proxy):
+        async def generate():
+            async with session.post(f"{url}/api/generate",
+                                    json={'model': MODEL, 'prompt': 'hello', 'stream': False}) as r:
+                await r.read()
+                return r.status, r.headers.get('Retry-After')
+
+        first = asyncio.create_task(generate())
+        await asyncio.sleep(0.1)
+        status, retry_after = await generate()
+        assert (await first)[0] == 200
+        assert status == 503 and retry_after
+
+    _with_proxy(mock, check, max_active=1, max_waiting=0)